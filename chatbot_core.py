@@ -1,41 +1,159 @@
 import os
+import glob
+import hashlib
+import math
 import pickle
+import uuid
+import functools
+import itertools
+import multiprocessing
+import asyncio
+import faiss
+import numpy as np
+from semantic_text_splitter import TextSplitter
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
 from langchain.prompts import ChatPromptTemplate
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 
 VECTORSTORE_PATH = "./vectorstore"
 DATA_PATH = "./data"
+EMBEDDING_CACHE_PATH = "./emb_cache"
+SAMPLE_CACHE_PATH = "./sample_cache"
+EMBEDDING_MODEL_NAME = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+# 청크 크기는 문자 수가 아닌 cl100k_base 토큰 수 기준입니다.
+# (text-embedding-3-* 와 같은 인코딩을 쓰는 모델명으로 토크나이저를 선택)
+CHUNK_TOKENIZER_MODEL = "gpt-4"
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 40
+
+# 코퍼스 크기별 FAISS 인덱스 구성: (최소 벡터 수, index_factory 문자열)
+# 1만 개 미만은 fp16으로 저장한 전수 탐색(파일/메모리 절반, 검색 시 fp32로 변환),
+# 10만 개 미만은 fp16 벡터 위의 HNSW 그래프 탐색, 그 이상은 int8 스칼라 양자화(4배 압축),
+# 100만 개 이상은 IVFPQ(64바이트 코드)로 압축합니다. PQ 앞의 OPQ 회전은 하위 벡터 간
+# 상관을 줄여 같은 코드 크기에서 재현율을 높입니다.
+# {nlist}는 빌드 시 코퍼스 크기에 맞춰 min(4096, 4·√N)으로 채워집니다.
+FAISS_INDEX_TIERS = [
+    (0, "SQfp16"),
+    (10_000, "HNSW32,SQfp16"),
+    (100_000, "IVF{nlist},SQ8"),
+    (1_000_000, "OPQ64,IVF{nlist},PQ64x8"),
+]
+IVF_MAX_NLIST = 4096
+# 이진 양자화(차원당 부호 1비트, fp32 대비 32배 축소) 사용 여부.
+# 해밍 거리로 후보를 고른 뒤 fp16 벡터로 재정렬해 정확도를 보정합니다.
+FAISS_BINARY_QUANTIZATION = False
+BINARY_INDEX_FACTORY = "LSH,Refine(SQfp16)"
+BINARY_RERANK_K_FACTOR = 32
+# 임베딩 요청 배치 크기와 동시 요청 수 (OpenAI 동시 요청 한도에 맞춤)
+EMBED_BATCH_SIZE = 512
+EMBED_MAX_CONCURRENCY = 16
+FAISS_NPROBE = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
 
 def get_embedding_model(api_key):
-    """OpenAI 임베딩 모델을 가져옵니다."""
-    return OpenAIEmbeddings(openai_api_key=api_key, model="text-embedding-3-small")
+    """OpenAI 임베딩 모델을 가져옵니다.
 
-def build_vectorstore(embedding_model):
-    """TXT 파일만 임베딩하여 벡터 저장소를 생성합니다."""
-    from langchain_community.document_loaders import DirectoryLoader, TextLoader
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    문서 임베딩은 텍스트의 SHA-256 해시를 키로 로컬 디스크에 캐시되므로,
+    재빌드 시에는 새로 추가되거나 바뀐 조각만 API로 임베딩합니다.
+    """
+    raw_embeddings = OpenAIEmbeddings(
+        openai_api_key=api_key,
+        model=EMBEDDING_MODEL_NAME,
+        chunk_size=EMBED_BATCH_SIZE
+    )
+    return CacheBackedEmbeddings.from_bytes_store(
+        raw_embeddings,
+        LocalFileStore(EMBEDDING_CACHE_PATH),
+        namespace=EMBEDDING_MODEL_NAME,
+        batch_size=EMBED_BATCH_SIZE,
+        key_encoder="sha256",
+    )
 
-    print("새로운 벡터 저장소를 생성합니다.")
-    loader = DirectoryLoader(
-        DATA_PATH,
-        glob="**/*.txt",
-        loader_cls=TextLoader,
-        show_progress=True,
-        loader_kwargs={'encoding': 'utf-8'}
+def _file_loader(path):
+    """파일 확장자에 맞는 LangChain 로더를 반환합니다."""
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+
+    if path.lower().endswith(".pdf"):
+        return PyPDFLoader(path)
+    return TextLoader(path, encoding='utf-8')
+
+def _load_file(path):
+    """파일 하나를 Document 목록으로 로드합니다 (프로세스 풀 워커에서 실행)."""
+    return _file_loader(path).load()
+
+def _load_and_split_file(path):
+    """파일을 페이지 단위로 스트리밍하며 바로 조각냅니다 (프로세스 풀 워커에서 실행).
+
+    전체 페이지 목록을 만들지 않으므로 워커는 한 번에 한 페이지만 메모리에 유지합니다.
+    """
+    chunks = []
+    for page in _file_loader(path).lazy_load():
+        chunks.extend(split_documents([page]))
+    return chunks
+
+def _find_files(data_path, extensions):
+    return sorted(
+        path
+        for ext in extensions
+        for path in glob.glob(os.path.join(data_path, "**", f"*{ext}"), recursive=True)
     )
-    documents = loader.load()
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs = text_splitter.split_documents(documents)
-    print(f"총 {len(docs)}개의 문서 조각으로 분할되었습니다.")
-    
-    # FAISS 벡터스토어 생성
-    vectorstore = FAISS.from_documents(
-        documents=docs,
-        embedding=embedding_model
+
+def _pool_size(num_files):
+    return max(1, min(num_files, (os.cpu_count() or 1) - 1))
+
+def load_documents(data_path, extensions=(".pdf", ".txt")):
+    """data_path 아래의 문서를 프로세스 풀로 병렬 파싱합니다.
+
+    PDF 파싱은 CPU 연산이라 스레드로는 GIL에 막히므로 파일마다 별도 프로세스를 사용합니다.
+    """
+    paths = _find_files(data_path, extensions)
+    if not paths:
+        return []
+    with multiprocessing.Pool(_pool_size(len(paths))) as pool:
+        nested = pool.map(_load_file, paths)
+    return [doc for docs in nested for doc in docs]
+
+def iter_document_chunks(data_path, extensions=(".pdf", ".txt")):
+    """data_path 아래 문서를 파싱·분할이 끝나는 파일 순서대로 조각 단위로 내보냅니다."""
+    paths = _find_files(data_path, extensions)
+    if not paths:
+        return
+    with multiprocessing.Pool(_pool_size(len(paths))) as pool:
+        for chunks in pool.imap_unordered(_load_and_split_file, paths):
+            yield from chunks
+
+@functools.lru_cache(maxsize=1)
+def _chunk_splitter():
+    """조각 분할기를 프로세스마다 한 번만 만듭니다 (페이지마다 토크나이저를 다시 읽지 않도록)."""
+    return TextSplitter.from_tiktoken_model(
+        CHUNK_TOKENIZER_MODEL, CHUNK_SIZE, overlap=CHUNK_OVERLAP
     )
+
+def split_documents(documents):
+    """Rust 기반 semantic-text-splitter로 문서를 토큰 단위로 조각내고 원본 메타데이터를 유지합니다."""
+    splitter = _chunk_splitter()
+    return [
+        Document(page_content=chunk, metadata=dict(doc.metadata))
+        for doc in documents
+        for chunk in splitter.chunks(doc.page_content)
+    ]
+
+def build_vectorstore(embedding_model):
+    """TXT 파일만 임베딩하여 벡터 저장소를 생성합니다."""
+    print("새로운 벡터 저장소를 생성합니다.")
+    # FAISS 벡터스토어 생성 (파일 파싱과 임베딩 요청이 겹쳐서 진행됩니다)
+    docs = iter_document_chunks(DATA_PATH, extensions=(".txt",))
+    vectorstore = build_faiss_vectorstore(docs, embedding_model)
+    print(f"총 {vectorstore.index.ntotal}개의 문서 조각을 임베딩했습니다.")
     
     # 벡터스토어 저장
     os.makedirs(VECTORSTORE_PATH, exist_ok=True)
@@ -43,24 +161,192 @@ def build_vectorstore(embedding_model):
     print("벡터 저장소 생성이 완료되었습니다.")
     return vectorstore
 
+def _tune_index(index):
+    """검색 시점 파라미터를 설정합니다 (IVF 계열은 nprobe, HNSW는 efSearch)."""
+    try:
+        faiss.extract_index_ivf(index).nprobe = FAISS_NPROBE
+    except RuntimeError:
+        pass  # IVF 계열이 아닌 인덱스
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = BINARY_RERANK_K_FACTOR
+
+@functools.lru_cache(maxsize=1)
+def _gpu_resources():
+    # GPU 인덱스가 살아 있는 동안 리소스 객체도 유지되어야 하므로 프로세스 단위로 공유합니다.
+    return faiss.StandardGpuResources()
+
+def _to_gpu(index):
+    """CUDA GPU가 있으면 인덱스를 GPU로 복제합니다 (faiss-gpu 빌드에서만 동작)."""
+    if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+        return index
+    options = faiss.GpuClonerOptions()
+    options.useFloat16 = True  # IVFPQ 룩업 테이블 등을 fp16으로 두어 GPU 메모리를 절반으로
+    try:
+        gpu_index = faiss.index_cpu_to_gpu(_gpu_resources(), 0, index, options)
+    except RuntimeError:
+        return index  # HNSW 등 GPU 미지원 인덱스는 CPU에서 검색
+    print("GPU에서 FAISS 검색을 수행합니다.")
+    return gpu_index
+
+def _distance_strategy(index):
+    """인덱스의 거리 척도에 맞는 LangChain 거리 전략을 반환합니다."""
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return DistanceStrategy.MAX_INNER_PRODUCT
+    return DistanceStrategy.EUCLIDEAN_DISTANCE
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+async def _aembed_all(embedding_model, docs):
+    semaphore = asyncio.Semaphore(EMBED_MAX_CONCURRENCY)
+    batches = _batched(docs, EMBED_BATCH_SIZE)
+    collected, tasks = [], []
+    # 응답을 바로 써 넣을 fp32 행렬. 배치마다 행 구간을 예약하고, 모자라면 두 배로 늘립니다.
+    xb = np.empty((EMBED_BATCH_SIZE, EMBEDDING_DIMENSIONS), dtype="float32")
+
+    async def embed(texts, start):
+        try:
+            vectors = await embedding_model.aembed_documents(texts)
+        finally:
+            semaphore.release()
+        # 이벤트 루프는 단일 스레드이므로 await 이후의 xb는 항상 최신 버퍼입니다.
+        xb[start:start + len(vectors)] = np.asarray(vectors, dtype="float32")
+
+    while True:
+        # 동시 요청이 가득 차면 다음 배치를 만들지 않고 기다립니다 (메모리 상한).
+        await semaphore.acquire()
+        # 제너레이터 소비(프로세스 풀 결과 대기)가 이벤트 루프를 막지 않도록 스레드에서 꺼냅니다.
+        batch = await asyncio.to_thread(next, batches, None)
+        if batch is None:
+            semaphore.release()
+            break
+        start = len(collected)
+        collected.extend(batch)
+        if len(collected) > len(xb):
+            grown = np.empty((max(2 * len(xb), len(collected)), EMBEDDING_DIMENSIONS), dtype="float32")
+            grown[:start] = xb[:start]
+            xb = grown
+        texts = [doc.page_content for doc in batch]
+        tasks.append(asyncio.create_task(embed(texts, start)))
+    await asyncio.gather(*tasks)
+    # 앞쪽 행 구간은 C-연속이므로 FAISS에 복사 없이 그대로 넘길 수 있습니다.
+    return collected, xb[:len(collected)]
+
+def embed_documents(embedding_model, docs):
+    """문서 조각을 EMBED_BATCH_SIZE 단위로 비동기 동시 임베딩합니다.
+
+    파싱(프로세스 풀) → 배치 구성 → 임베딩(aembed_documents) 단계가 파이프라인으로
+    겹쳐 진행됩니다. docs가 제너레이터이면 배치가 채워지는 즉시 요청을 보내고,
+    진행 중인 요청이 EMBED_MAX_CONCURRENCY에 이르면 응답이 올 때까지 배치 구성을 멈춥니다.
+    반환값은 (문서 목록, float32 임베딩 행렬)입니다.
+    """
+    return asyncio.run(_aembed_all(embedding_model, docs))
+
+def _create_faiss_index(xb):
+    """벡터 수에 맞는 인덱스를 만들고 학습/추가합니다 (정규화된 벡터, 내적 기준)."""
+    factory = FAISS_INDEX_TIERS[0][1]
+    for min_vectors, tier_factory in FAISS_INDEX_TIERS:
+        if len(xb) >= min_vectors:
+            factory = tier_factory
+
+    if FAISS_BINARY_QUANTIZATION:
+        # IndexLSH(회전/임계값 학습 없음)는 x > 0 부호 비트를 저장하므로
+        # IndexBinaryFlat과 같은 코드를 쓰면서 float 질의를 그대로 받을 수 있습니다.
+        # 정규화된 벡터에서는 L2 순위가 내적 순위와 같습니다.
+        index = faiss.index_factory(xb.shape[1], BINARY_INDEX_FACTORY)
+    else:
+        nlist = min(IVF_MAX_NLIST, 4 * int(math.sqrt(len(xb))))
+        index = faiss.index_factory(xb.shape[1], factory.format(nlist=nlist), faiss.METRIC_INNER_PRODUCT)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        index.train(xb)
+    index.add(xb)
+    try:
+        # MMR 검색은 후보 벡터를 reconstruct하므로 IVF 계열은 direct map이 필요합니다.
+        faiss.extract_index_ivf(index).make_direct_map()
+    except RuntimeError:
+        pass
+    return index
+
+def _dedupe_chunks(docs):
+    """내용이 같은 문서 조각을 한 번만 내보냅니다.
+
+    페이지마다 반복되는 머리말/꼬리말 조각을 임베딩 전에 걸러내고,
+    중복된 조각의 출처는 처음 나온 조각의 metadata["sources"]에 모읍니다.
+    """
+    seen = {}
+    for doc in docs:
+        key = hashlib.blake2b(doc.page_content.encode("utf-8"), digest_size=16).digest()
+        first = seen.get(key)
+        source = doc.metadata.get("source")
+        if first is None:
+            doc.metadata["sources"] = [source] if source is not None else []
+            seen[key] = doc
+            yield doc
+        elif source is not None and source not in first.metadata["sources"]:
+            first.metadata["sources"].append(source)
+
+def build_faiss_vectorstore(docs, embedding_model):
+    """문서 조각(리스트 또는 제너레이터)을 임베딩하여 FAISS 벡터 저장소를 구성합니다.
+
+    인덱스 종류는 코퍼스 크기에 따라 FAISS_INDEX_TIERS에서 선택합니다.
+    """
+    docs, xb = embed_documents(embedding_model, _dedupe_chunks(docs))
+    if not docs:
+        raise ValueError("임베딩할 문서 조각이 없습니다.")
+    # OpenAI 임베딩은 이미 단위 길이이므로 정규화 비용은 미미합니다.
+    faiss.normalize_L2(xb)
+    index = _create_faiss_index(xb)
+
+    ids = [str(uuid.uuid4()) for _ in docs]
+    return FAISS(
+        embedding_function=embedding_model,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, docs))),
+        index_to_docstore_id=dict(enumerate(ids)),
+        distance_strategy=_distance_strategy(index),
+    )
+
 def get_vectorstore(embedding_model):
     """디스크에 저장된 벡터 저장소를 불러옵니다."""
     faiss_index_path = os.path.join(VECTORSTORE_PATH, "index.faiss")
     faiss_pkl_path = os.path.join(VECTORSTORE_PATH, "index.pkl")
     
-    if not (os.path.exists(faiss_index_path) and os.path.exists(faiss_pkl_path)):
+    # 파일마다 stat을 호출하지 않고 디렉터리를 한 번만 나열합니다.
+    try:
+        with os.scandir(VECTORSTORE_PATH) as it:
+            names = {entry.name for entry in it}
+    except FileNotFoundError:
+        names = set()
+    if not {"index.faiss", "index.pkl"}.issubset(names):
         raise FileNotFoundError(
             f"'{VECTORSTORE_PATH}' 벡터 저장소를 찾을 수 없습니다. "
             f"먼저 'python build_vectorstore.py'를 실행하여 벡터 저장소를 생성해주세요."
         )
     print("기존 벡터 저장소를 로드합니다.")
-    return FAISS.load_local(VECTORSTORE_PATH, embedding_model, allow_dangerous_deserialization=True)
+    # FAISS.load_local은 index.faiss 전체를 힙으로 읽으므로, 직접 mmap으로 열어
+    # 필요한 부분만 OS 페이지 캐시에서 읽히도록 합니다.
+    index = faiss.read_index(faiss_index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    # save_local이 만든 신뢰된 로컬 파일만 역직렬화합니다.
+    with open(faiss_pkl_path, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    # nprobe 등은 GPU 복제 시 함께 복사되므로 먼저 설정합니다.
+    _tune_index(index)
+    return FAISS(
+        embedding_function=embedding_model,
+        index=_to_gpu(index),
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        distance_strategy=_distance_strategy(index),
+    )
 
 def create_sample_vectorstore(embedding_model):
     """샘플 데이터로 벡터 저장소를 생성합니다 (Streamlit Cloud용)."""
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-    from langchain_core.documents import Document
-    
     # 샘플 금융 규제 데이터
     sample_texts = [
         """개인정보보호법 제15조 (개인정보의 수집·이용)
@@ -81,6 +367,15 @@ def create_sample_vectorstore(embedding_model):
 4. 동의를 거부할 권리가 있다는 사실 및 동의 거부에 따른 불이익이 있는 경우에는 그 불이익의 내용"""
     ]
     
+    # 샘플 텍스트가 바뀌면 캐시 키도 바뀌어 자동으로 다시 생성됩니다.
+    cache_key = hashlib.sha256(
+        "\x00".join([EMBEDDING_MODEL_NAME, *sample_texts]).encode("utf-8")
+    ).hexdigest()[:16]
+    cache_path = os.path.join(SAMPLE_CACHE_PATH, cache_key)
+    if os.path.exists(os.path.join(cache_path, "index.faiss")):
+        print("캐시된 샘플 벡터 저장소를 로드합니다.")
+        return FAISS.load_local(cache_path, embedding_model, allow_dangerous_deserialization=True)
+
     # 문서 객체 생성
     documents = []
     for i, text in enumerate(sample_texts):
@@ -91,19 +386,32 @@ def create_sample_vectorstore(embedding_model):
         documents.append(doc)
     
     # 텍스트 분할
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs = text_splitter.split_documents(documents)
+    docs = split_documents(documents)
     
-    # FAISS 벡터스토어 생성 (메모리에만 저장)
+    # FAISS 벡터스토어 생성 후 다음 콜드 스타트를 위해 디스크에 캐시
     vectorstore = FAISS.from_documents(documents=docs, embedding=embedding_model)
+    os.makedirs(cache_path, exist_ok=True)
+    vectorstore.save_local(cache_path)
     
     print(f"샘플 벡터 저장소 생성 완료: {len(docs)}개 문서 조각")
     return vectorstore
 
-def create_rag_chain(vectorstore, api_key):
-    """RAG 체인을 생성합니다."""
-    llm = ChatOpenAI(openai_api_key=api_key, model_name="gpt-4o", temperature=0)
-    prompt = ChatPromptTemplate.from_template("""
+@functools.lru_cache(maxsize=1)
+def _get_llm(api_key):
+    """채팅 모델을 프로세스 단위로 재사용하여 HTTP 연결 풀(TCP/TLS 세션)을 유지합니다."""
+    return ChatOpenAI(
+        openai_api_key=api_key,
+        model_name="gpt-4o",
+        temperature=0,
+        streaming=True,
+        max_retries=3,
+        timeout=30
+    )
+
+# 고정 지침은 system 메시지 앞부분에 두어 OpenAI 프롬프트 캐싱이 적용되도록 하고,
+# 매번 바뀌는 Context와 질문만 user 메시지로 보냅니다. 템플릿은 import 시 한 번만 파싱합니다.
+_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """
     당신은 금융감독원에서 20년간 근무한 시니어 금융 규제 전문가입니다. 
     금융보안, 개인정보보호, 전자금융거래법, 자본시장법 등 모든 금융 규제에 정통하며, 
     금융회사들의 컴플라이언스 업무를 직접 지도해온 실무 전문가입니다.
@@ -145,8 +453,6 @@ def create_rag_chain(vectorstore, api_key):
     
     === Context 활용 지침 ===
     
-    제공된 Context: {context}
-    
     1. Context에 관련 정보가 있는 경우:
        - Context의 정보를 최우선으로 활용
        - 출처를 명확히 표기: [출처: 파일명, 페이지/섹션]
@@ -162,8 +468,6 @@ def create_rag_chain(vectorstore, api_key):
     
     === 질문 분석 ===
     
-    사용자 질문: {input}
-    
     질문 유형 판단:
     - 법령 해석: 정확한 조항과 해석 제공
     - 실무 적용: 구체적 실행 방안 제시  
@@ -172,8 +476,23 @@ def create_rag_chain(vectorstore, api_key):
     
     위의 구조에 따라 전문적이고 실무적인 답변을 제공해주세요.
     모든 답변은 한국어로 작성하며, 금융회사 실무진이 바로 활용할 수 있는 수준으로 구체적으로 작성해주세요.
-    """)
-    document_chain = create_stuff_documents_chain(llm, prompt)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+    """),
+    ("human", """
+    제공된 Context: {context}
+    
+    사용자 질문: {input}
+    """),
+])
+
+def create_rag_chain(vectorstore, api_key):
+    """RAG 체인을 생성합니다."""
+    llm = _get_llm(api_key)
+    document_chain = create_stuff_documents_chain(llm, _PROMPT)
+    _tune_index(vectorstore.index)
+    # MMR로 중복 조각을 걸러내 프롬프트에 들어가는 Context 토큰을 줄입니다.
+    retriever = vectorstore.as_retriever(
+        search_type="mmr",
+        search_kwargs={"k": 2, "fetch_k": 10, "lambda_mult": 0.5}
+    )
     retrieval_chain = create_retrieval_chain(retriever, document_chain)
     return retrieval_chain
\ No newline at end of file
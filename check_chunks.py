@@ -1,6 +1,5 @@
 import os
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from chatbot_core import load_documents, split_documents
 
 # build_vectorstore.py와 동일한 설정을 사용합니다.
 DATA_PATH = "./data"
@@ -12,24 +11,13 @@ def check_document_chunks():
     그 결과를 파일로 저장하여 직접 확인할 수 있게 합니다.
     """
     print(f"'{DATA_PATH}' 폴더에서 문서를 로드합니다...")
-    loader = DirectoryLoader(
-        DATA_PATH,
-        glob="**/*.pdf", # PDF 파일만 대상으로 확인
-        loader_cls=PyPDFLoader,
-        show_progress=True,
-        use_multithreading=True
-    )
-    documents = loader.load()
+    documents = load_documents(DATA_PATH, extensions=(".pdf",)) # PDF 파일만 대상으로 확인
     if not documents:
         print(f"'{DATA_PATH}' 폴더에 확인할 PDF 파일이 없습니다.")
         return
 
     print("문서를 텍스트 조각으로 분할합니다...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50
-    )
-    docs = text_splitter.split_documents(documents)
+    docs = split_documents(documents)
     
     print(f"총 {len(docs)}개의 문서 조각을 생성했습니다.")
     
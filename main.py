@@ -1,11 +1,55 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
+import re
+import bisect
+import hashlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
 import plotly.graph_objects as go
-import pandas as pd
+import fitz
 from dotenv import load_dotenv
-from chatbot_core import get_embedding_model, get_vectorstore, build_vectorstore, create_rag_chain, create_sample_vectorstore
-from langchain_community.document_loaders import PyPDFLoader
-from multi_agent_system import MultiAgentAnalysisSystem, create_intelligent_router
+from chatbot_core import get_embedding_model, get_vectorstore, build_vectorstore, create_rag_chain, create_sample_vectorstore, EMBEDDING_CACHE_PATH
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+try:
+    from tavily import TavilyClient
+except ImportError:  # 웹 검색은 선택 기능
+    TavilyClient = None
+from multi_agent_system import MultiAgentAnalysisSystem, create_intelligent_router, MAX_INPUT_TOKENS, CHART_HEIGHT, count_tokens
+
+def _lazy_pages(pdf_bytes, limit=None):
+    """메모리에 있는 PDF에서 페이지 텍스트를 앞에서부터 필요한 만큼만 추출해 하나씩 내보냅니다."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf:
+        page_count = pdf.page_count if limit is None else min(limit, pdf.page_count)
+        for i in range(page_count):
+            yield pdf.load_page(i).get_text("text")
+
+def _load_pdf_fast(pdf_bytes, source, max_pages=None):
+    """PyMuPDF(MuPDF C 라이브러리)로 PDF를 페이지별 Document로 추출합니다."""
+    return [
+        Document(page_content=text, metadata={"source": source, "page": i})
+        for i, text in enumerate(_lazy_pages(pdf_bytes, max_pages))
+    ]
+
+# 점수 구간별 (글자색, 배경색): 70 미만 빨강, 70대 주황, 80대 파랑, 90 이상 녹색
+SCORE_THRESHOLDS = (70, 80, 90)
+SCORE_PALETTE = (
+    ("#dc2626", "#fef2f2"),
+    ("#f59e0b", "#fffbeb"),
+    ("#3b82f6", "#eff6ff"),
+    ("#16a34a", "#f0fdf4"),
+)
+
+def _score_palette(score):
+    """점수에 해당하는 (글자색, 배경색)을 반환합니다."""
+    return SCORE_PALETTE[bisect.bisect_right(SCORE_THRESHOLDS, score)]
 
 def _render_score_card(card):
     """점수 카드 렌더링 함수"""
@@ -14,19 +58,7 @@ def _render_score_card(card):
     grade = card["grade"]
     reason = card["reason"]
     
-    # 점수에 따른 색상 설정
-    if score >= 90:
-        color = "#16a34a"  # 녹색
-        bg_color = "#f0fdf4"
-    elif score >= 80:
-        color = "#3b82f6"  # 파란색
-        bg_color = "#eff6ff"
-    elif score >= 70:
-        color = "#f59e0b"  # 주황색
-        bg_color = "#fffbeb"
-    else:
-        color = "#dc2626"  # 빨간색
-        bg_color = "#fef2f2"
+    color, bg_color = _score_palette(score)
     
     st.markdown(f"""
     <div style="
@@ -54,6 +86,107 @@ def _render_score_card(card):
     </div>
     """, unsafe_allow_html=True)
 
+@functools.lru_cache(maxsize=8)
+def _info_cards_html(doc_type, analyzed_at, risk_count, regulation_count):
+    """분석 정보 / 발견사항 요약 카드를 2열 grid 하나로 묶은 HTML (분석이 끝나면 값이 바뀌지 않으므로 재사용)"""
+    return f"""
+    <div style="display: grid; grid-template-columns: repeat(2, 1fr); gap: 1rem;">
+        <div class="info-card">
+            <h4 style="color: #1e40af; margin-top: 0;">📑 분석 정보</h4>
+            <p style="margin: 0; color: #374151;">
+                <strong>문서 유형:</strong> {doc_type}<br>
+                <strong>분석 일시:</strong> {analyzed_at}<br>
+                <strong>분석 에이전트:</strong> 5개 AI 협업
+            </p>
+        </div>
+        <div class="info-card">
+            <h4 style="color: #dc2626; margin-top: 0;">🔍 발견사항 요약</h4>
+            <p style="margin: 0; color: #374151;">
+                <strong>위험요소:</strong> {risk_count}개 발견<br>
+                <strong>규제사항:</strong> {regulation_count}개 확인<br>
+                <strong>웹검색:</strong> 최신 정보 반영
+            </p>
+        </div>
+    </div>
+    """
+
+STYLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "styles.css")
+
+@st.cache_resource
+def _load_css(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+# --- 입력과 무관한 정적 HTML (재실행마다 문자열을 새로 만들지 않도록 모듈 상수로 둠) ---
+_HTML_ANALYSIS_START = """
+<div class="info-card">
+    <h4 style="color: #1e40af; margin-top: 0;">🚀 멀티에이전트 분석 시작하기</h4>
+    <p style="margin: 0; color: #64748b;">
+        위에서 분석 방법을 선택하고 내용을 입력한 후 분석을 시작하세요.
+    </p>
+</div>
+"""
+
+_HTML_ARCHITECTURE_CARDS = """
+<div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 1rem;">
+    <div class="info-card">
+        <h4 style="color: #16a34a; margin-top: 0;">🤖 AI 에이전트</h4>
+        <ul style="margin: 0; padding-left: 1rem; color: #374151;">
+            <li>📋 문서 분류·1차 분석 에이전트</li>
+            <li>⚠️ 위험도 평가 에이전트</li>
+            <li>🌐 웹 검색 에이전트</li>
+            <li>📊 점수 계산 에이전트</li>
+            <li>📝 보고서 생성 에이전트</li>
+        </ul>
+    </div>
+    <div class="info-card">
+        <h4 style="color: #dc2626; margin-top: 0;">📊 분석 항목</h4>
+        <ul style="margin: 0; padding-left: 1rem; color: #374151;">
+            <li>개인정보보호</li>
+            <li>데이터보안</li>
+            <li>접근제어</li>
+            <li>규제준수</li>
+            <li>전체위험도</li>
+        </ul>
+    </div>
+    <div class="info-card">
+        <h4 style="color: #f59e0b; margin-top: 0;">📈 결과물</h4>
+        <ul style="margin: 0; padding-left: 1rem; color: #374151;">
+            <li>종합 분석 보고서</li>
+            <li>점수 시각화 차트</li>
+            <li>위험도 평가 결과</li>
+            <li>개선 권장사항</li>
+            <li>최신 규제 정보</li>
+        </ul>
+    </div>
+</div>
+"""
+
+_HTML_API_KEY_GUIDE = """
+<div class="section-header">
+    ⚠️ API 키 설정이 필요합니다
+</div>
+<div class="info-card">
+    <h4 style="color: #dc2626; margin-top: 0;">🔧 설정 방법</h4>
+    <ol style="color: #374151; margin: 0;">
+        <li>프로젝트 폴더에 <code>.env</code> 파일을 생성하세요</li>
+        <li>파일에 다음과 같이 작성하세요:</li>
+    </ol>
+    <div style="background: #f1f5f9; padding: 1rem; border-radius: 8px; margin: 1rem 0; font-family: monospace;">
+        OPENAI_API_KEY=your_api_key_here<br>
+        TAVILY_API_KEY=your_tavily_api_key_here  # 웹 검색 기능용 (선택)
+    </div>
+    <ol start="3" style="color: #374151; margin: 0;">
+        <li>앱을 다시 시작하세요</li>
+    </ol>
+    <div style="margin-top: 1rem; padding: 1rem; background: #fef3c7; border-radius: 8px; border-left: 4px solid #f59e0b;">
+        <p style="margin: 0; color: #92400e;">
+            💡 <strong>참고:</strong> Tavily API는 선택사항입니다. OPENAI_API_KEY만 있어도 기본 기능은 모두 사용 가능합니다.
+        </p>
+    </div>
+</div>
+"""
+
 # --- 환경변수 로드 ---
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -66,109 +199,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 커스텀 CSS 스타일
-st.markdown("""
-<style>
-    /* 메인 헤더 스타일 */
-    .main-header {
-        background: linear-gradient(90deg, #1e3a8a 0%, #3b82f6 50%, #06b6d4 100%);
-        padding: 2rem;
-        border-radius: 10px;
-        color: white;
-        text-align: center;
-        margin-bottom: 2rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    
-    /* 사이드바 스타일 */
-    .css-1d391kg {
-        background: linear-gradient(180deg, #f8fafc 0%, #e2e8f0 100%);
-    }
-    
-    /* 메트릭 카드 스타일 */
-    .metric-card {
-        background: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        border-left: 4px solid #3b82f6;
-        box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        margin: 1rem 0;
-    }
-    
-    /* 결과 박스 스타일 */
-    .result-box {
-        background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%);
-        border: 1px solid #0ea5e9;
-        padding: 1.5rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-    }
-    
-    /* 위험도 표시 */
-    .risk-high { color: #dc2626; font-weight: bold; }
-    .risk-medium { color: #f59e0b; font-weight: bold; }
-    .risk-low { color: #16a34a; font-weight: bold; }
-    
-    /* 버튼 스타일 */
-    .stButton > button {
-        background: linear-gradient(90deg, #3b82f6 0%, #1d4ed8 100%);
-        color: white;
-        border: none;
-        padding: 0.5rem 2rem;
-        border-radius: 25px;
-        font-weight: 600;
-        transition: all 0.3s;
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 8px rgba(59, 130, 246, 0.3);
-    }
-    
-    /* 파일 업로더 스타일 */
-    .stFileUploader {
-        border: 2px dashed #3b82f6;
-        border-radius: 10px;
-        padding: 2rem;
-        text-align: center;
-        background: #f8fafc;
-    }
-    
-    /* 채팅 메시지 스타일 */
-    .stChatMessage {
-        border-radius: 15px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-    }
-    
-    /* 섹션 헤더 */
-    .section-header {
-        background: linear-gradient(90deg, #1e40af 0%, #3b82f6 100%);
-        color: white;
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-        text-align: center;
-        font-size: 1.2rem;
-        font-weight: 600;
-    }
-    
-    /* 정보 카드 */
-    .info-card {
-        background: white;
-        border: 1px solid #e5e7eb;
-        border-radius: 10px;
-        padding: 1.5rem;
-        margin: 1rem 0;
-        box-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
-    }
-    
-    /* 스피너 커스터마이징 */
-    .stSpinner {
-        color: #3b82f6;
-    }
-</style>
-""", unsafe_allow_html=True)
+# 커스텀 CSS 스타일 (assets/styles.css를 프로세스당 한 번만 읽음)
+st.markdown(f"<style>{_load_css(STYLES_PATH)}</style>", unsafe_allow_html=True)
 
 # --- 메인 헤더 ---
 st.markdown("""
@@ -185,10 +217,9 @@ st.sidebar.markdown("""
     <h2 style="color: #1e40af; margin-bottom: 0;">🏛️ FSEC AI</h2>
     <p style="color: #64748b; font-size: 0.9rem; margin: 0;">금융보안 규제 시스템</p>
 </div>
+<hr>
 """, unsafe_allow_html=True)
 
-st.sidebar.markdown("---")
-
 page = st.sidebar.radio(
     "📋 **기능 선택**",
     ["🤖 금융 보안 규제 QA 챗봇", "🔒 보안 적정성 평가", "🚀 AI 멀티에이전트 분석"],
@@ -208,9 +239,9 @@ if TAVILY_API_KEY:
 else:
     st.sidebar.warning("🟡 웹 검색 기능 비활성화")
 
-st.sidebar.markdown("---")
-
+# 연속된 HTML 블록은 한 번의 markdown 호출로 전송
 st.sidebar.markdown("""
+<hr>
 <div class="info-card">
     <h4 style="color: #1e40af; margin-top: 0;">💡 시스템 정보</h4>
     <ul style="margin: 0; padding-left: 1rem;">
@@ -220,20 +251,21 @@ st.sidebar.markdown("""
         <li>🛡️ 보안: 로컬 처리</li>
     </ul>
 </div>
-""", unsafe_allow_html=True)
-
-st.sidebar.markdown("""
 <div style="text-align: center; padding: 1rem; color: #64748b; font-size: 0.8rem;">
     © 2024 FSEC AI System<br>
     Financial Security Compliance
 </div>
 """, unsafe_allow_html=True)
 
-@st.cache_resource
-def initialize_chatbot(api_key):
-    if not api_key:
-        return None, None
-    embedding_model = get_embedding_model(api_key)
+def _warmup(embedding_model, rag_chain):
+    """첫 사용자 요청 전에 OpenAI 연결(TLS)과 체인을 미리 한 번 호출해 둡니다."""
+    try:
+        embedding_model.embed_query("warmup")
+        rag_chain.invoke({"input": "ping"})
+    except Exception as e:
+        print(f"워밍업 실패 (무시): {e}")
+
+def _load_vectorstore(embedding_model):
     try:
         vectorstore = get_vectorstore(embedding_model)
         st.success("✅ 기존 벡터 저장소를 로드했습니다.")
@@ -249,82 +281,191 @@ def initialize_chatbot(api_key):
         st.warning(f"⚠️ 벡터 저장소 로드 오류: {str(e)}")
         st.info("📝 샘플 데이터로 벡터 저장소를 생성합니다.")
         vectorstore = create_sample_vectorstore(embedding_model)
-    
-    rag_chain = create_rag_chain(vectorstore, api_key)
-    return rag_chain, embedding_model
+    return vectorstore
+
+@st.cache_resource
+def initialize_chatbot(api_key, tavily_api_key):
+    if not api_key:
+        return None, None, None, None
+    # 멀티에이전트 시스템과 라우터는 벡터 저장소와 무관하므로 로드와 동시에 초기화합니다.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        multi_agent_future = executor.submit(MultiAgentAnalysisSystem, api_key, tavily_api_key)
+        router_future = executor.submit(create_intelligent_router, api_key)
+        embedding_model = get_embedding_model(api_key)
+        vectorstore = _load_vectorstore(embedding_model)
+        rag_chain = create_rag_chain(vectorstore, api_key)
+        # cache_resource 안에서 시작하므로 프로세스당 한 번만 실행됩니다.
+        threading.Thread(target=_warmup, args=(embedding_model, rag_chain), daemon=True).start()
+        return rag_chain, embedding_model, multi_agent_future.result(), router_future.result()
 
 if OPENAI_API_KEY:
-    rag_chain, embedding_model = initialize_chatbot(OPENAI_API_KEY)
-    # 멀티에이전트 시스템 초기화
-    multi_agent_system = MultiAgentAnalysisSystem(OPENAI_API_KEY, TAVILY_API_KEY)
-    intelligent_router = create_intelligent_router(OPENAI_API_KEY)
+    rag_chain, embedding_model, multi_agent_system, intelligent_router = initialize_chatbot(OPENAI_API_KEY, TAVILY_API_KEY)
 else:
     rag_chain, embedding_model = None, None
     multi_agent_system = None
     intelligent_router = None
 
+@st.cache_data(max_entries=1024, ttl=3600, show_spinner=False)
+def _cached_route(normalized_prompt, _router):
+    """같은 질문(공백/대소문자 정규화 기준)은 라우팅 LLM 호출 없이 이전 결과를 재사용합니다."""
+    return _router(normalized_prompt)
+
+def _stream_answer(chain, query, response):
+    """RAG 체인 출력에서 답변 토큰만 내보내고, 검색된 context는 response에 담아둡니다."""
+    for chunk in chain.stream({"input": query}):
+        if "context" in chunk:
+            response["context"] = chunk["context"]
+        if "answer" in chunk:
+            yield chunk["answer"]
+
+@st.cache_data(show_spinner=False)
+def _build_score_chart(score_items):
+    """점수 항목(정렬된 튜플)이 같으면 직렬화된 막대 차트 JSON을 재사용합니다."""
+    return multi_agent_system.create_score_chart(dict(score_items)).to_json()
+
+@st.cache_data(show_spinner=False)
+def _build_radar_chart(score_items):
+    """점수 항목(정렬된 튜플)이 같으면 직렬화된 레이더 차트 JSON을 재사용합니다."""
+    return multi_agent_system.create_radar_chart(dict(score_items)).to_json()
+
+# 레이더(scatterpolar) 차트도 그려야 하므로 basic 번들이 아닌 전체 번들 사용
+PLOTLY_JS_CDN = "https://cdn.plot.ly/plotly-2.35.2.min.js"
+
+def _render_plotly_json(fig_json):
+    """미리 직렬화한 Figure JSON을 Plotly.js로 바로 그려 st.plotly_chart의 직렬화를 건너뜁니다."""
+    components.html(f"""
+    <div id="chart"></div>
+    <script src="{PLOTLY_JS_CDN}"></script>
+    <script>Plotly.newPlot("chart", {fig_json}, {{displaylogo: false}});</script>
+    """, height=CHART_HEIGHT + 20)
+
+@st.cache_resource
+def _tavily_client(api_key):
+    """TavilyClient를 프로세스 단위로 재사용합니다."""
+    if TavilyClient is None:
+        raise ImportError("tavily-python 패키지가 설치되어 있지 않습니다.")
+    return TavilyClient(api_key=api_key)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_tavily(query_key, api_key):
+    """정규화된 검색어 기준으로 Tavily 검색 결과를 1시간 동안 캐시합니다."""
+    tavily = _tavily_client(api_key)
+    
+    # 금융 규제 관련 검색 쿼리 생성
+    search_query = f"금융 규제 보안 가이드라인 {query_key} 금융위원회 금융보안원"
+    
+    search_result = tavily.search(
+        query=search_query,
+        search_depth="advanced",
+        max_results=3,
+        include_domains=["fss.or.kr", "fsc.go.kr", "fsec.or.kr"]  # 금융 관련 공식 사이트
+    )
+    
+    additional_info = ""
+    if search_result.get("results"):
+        additional_info = "\n\n=== 추가 검색 정보 ===\n"
+        for i, result in enumerate(search_result["results"][:3]):
+            additional_info += f"\n**[웹 검색 {i+1}] {result.get('title', '')}**\n"
+            additional_info += f"출처: {result.get('url', '')}\n"
+            additional_info += f"내용: {result.get('content', '')[:300]}...\n"
+    
+    return additional_info
 
 def search_additional_info(query, api_key):
     """Tavily API를 사용하여 추가 정보를 검색합니다."""
     try:
-        from tavily import TavilyClient
-        
         if not api_key:
             return "Tavily API 키가 설정되지 않았습니다."
         
-        tavily = TavilyClient(api_key=api_key)
-        
-        # 금융 규제 관련 검색 쿼리 생성
-        search_query = f"금융 규제 보안 가이드라인 {query} 금융위원회 금융보안원"
-        
-        search_result = tavily.search(
-            query=search_query,
-            search_depth="advanced",
-            max_results=3,
-            include_domains=["fss.or.kr", "fsc.go.kr", "fsec.or.kr"]  # 금융 관련 공식 사이트
-        )
-        
-        additional_info = ""
-        if search_result.get("results"):
-            additional_info = "\n\n=== 추가 검색 정보 ===\n"
-            for i, result in enumerate(search_result["results"][:3]):
-                additional_info += f"\n**[웹 검색 {i+1}] {result.get('title', '')}**\n"
-                additional_info += f"출처: {result.get('url', '')}\n"
-                additional_info += f"내용: {result.get('content', '')[:300]}...\n"
-        
-        return additional_info
+        query_key = re.sub(r"\s+", " ", query.strip())[:256]
+        return _cached_tavily(query_key, api_key)
         
     except Exception as e:
         return f"웹 검색 중 오류 발생: {str(e)}"
 
-def security_assessment_content(content, embedding_model, is_pdf=False, uploaded_file=None):
-    from langchain_community.vectorstores import FAISS
-    from langchain_core.documents import Document
-    from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-    if is_pdf and uploaded_file:
-        temp_dir = "temp"
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_path = os.path.join(temp_dir, uploaded_file.name)
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        loader = PyPDFLoader(temp_path)
-        documents = loader.load()
+def _split_for_assessment(documents):
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=20)
+    return text_splitter.split_documents(documents)[:30]
+
+@st.cache_data(show_spinner=False)
+def _split_pdf_cached(file_hash, _raw_bytes, file_name):
+    """업로드 파일의 SHA-256을 키로 PDF 추출/분할 결과를 캐시합니다.
+
+    같은 PDF로 다시 실행되면 파싱과 분할을 건너뜁니다. (_raw_bytes는 캐시 키 계산에서 제외)
+    """
+    documents = _load_pdf_fast(_raw_bytes, file_name)
+    return documents, _split_for_assessment(documents)
+
+def _embed_batch(embedding_model, docs):
+    """모든 문서 조각을 한 번의 embed_documents 호출로 임베딩합니다.
+
+    get_embedding_model의 chunk_size(EMBED_BATCH_SIZE)가 조각 수(최대 30)보다 크므로
+    OpenAI 요청 한 번으로 처리됩니다.
+    """
+    return np.asarray(embedding_model.embed_documents([doc.page_content for doc in docs]), dtype="float32")
+
+def _embed_pdf_cached(embedding_model, docs, file_hash):
+    """문서 조각 임베딩을 EMBEDDING_CACHE_PATH/{sha256}.npy에 저장해 재사용합니다."""
+    cache_path = os.path.join(EMBEDDING_CACHE_PATH, f"{file_hash}.npy")
+    if os.path.exists(cache_path):
+        return np.load(cache_path)
+    vectors = _embed_batch(embedding_model, docs)
+    os.makedirs(EMBEDDING_CACHE_PATH, exist_ok=True)
+    np.save(cache_path, vectors)
+    return vectors
+
+def _build_assessment_vectorstore(docs, vectors, embedding_model):
+    """업로드 문서용 임시 인덱스를 fp16 스칼라 양자화로 구성합니다 (질의 벡터는 fp32 그대로).
+
+    정규화된 벡터의 내적(코사인 유사도)으로 검색합니다.
+    """
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexScalarQuantizer(vectors.shape[1], faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    index.add(vectors)
+    ids = [str(i) for i in range(len(docs))]
+    # 조각 수가 적고 인덱스와 함께 버려지는 임시 저장소이므로 메모리에 둡니다.
+    return FAISS(
+        embedding_function=embedding_model,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(ids, docs))),
+        index_to_docstore_id=dict(enumerate(ids)),
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+    )
+
+def _agent_input_sections(content, embedding_model):
+    """긴 입력은 토큰 기준 조각으로 나눈 뒤, 에이전트별 작업과 관련된 조각만 골라 넘깁니다."""
+    if count_tokens(content) <= MAX_INPUT_TOKENS:
+        return None
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name="o200k_base", chunk_size=300, chunk_overlap=30
+    )
+    chunks = splitter.split_documents([Document(page_content=content, metadata={"source": "분석 대상"})])
+    vectorstore = _build_assessment_vectorstore(chunks, _embed_batch(embedding_model, chunks), embedding_model)
+    return MultiAgentAnalysisSystem.select_input_sections(vectorstore, k=4)
+
+def _doc_keywords(text):
+    """웹 검색어로 쓸 문서 앞부분 (평가와 결과 화면의 검색이 같은 Tavily 캐시 키를 쓰도록 한곳에서 만듦)"""
+    return text[:500]
+
+def security_assessment_content(content, embedding_model, pdf=None):
+    """보안 적정성 평가를 수행합니다.
+
+    pdf는 호출 측에서 한 번만 추출한 (file_hash, documents, docs) 튜플입니다.
+    """
+    if pdf:
+        file_hash, documents, docs = pdf
+        vectors = _embed_pdf_cached(embedding_model, docs, file_hash)
     elif content:
         documents = [Document(page_content=content, metadata={"source": "입력 텍스트"})]
+        docs = _split_for_assessment(documents)
+        vectors = _embed_batch(embedding_model, docs)
     else:
         return "평가할 텍스트 또는 PDF 파일을 입력/업로드해주세요.", ""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=20)
-    docs = text_splitter.split_documents(documents)
-    docs = docs[:30]
-    vectorstore = FAISS.from_documents(docs, embedding=embedding_model)
+    vectorstore = _build_assessment_vectorstore(docs, vectors, embedding_model)
     rag_chain_file = create_rag_chain(vectorstore, OPENAI_API_KEY)
 
     # 문서 내용에서 키워드 추출
-    doc_keywords = ""
-    if documents:
-        sample_content = documents[0].page_content[:500]
-        doc_keywords = sample_content
+    doc_keywords = _doc_keywords(documents[0].page_content) if documents else ""
     
     # Tavily로 추가 정보 검색
     additional_info = search_additional_info(doc_keywords, TAVILY_API_KEY)
@@ -350,6 +491,134 @@ def security_assessment_content(content, embedding_model, is_pdf=False, uploaded
             sources += f"> {snippet}...\n\n"
     return answer, sources
 
+@st.fragment
+def _render_results(analysis_result):
+    """점수 시각화 탭과 요약 카드만 다시 그리는 fragment (탭·버튼 조작 시 페이지 전체를 재실행하지 않음)"""
+    compliance_score = analysis_result.get("compliance_score") or {}
+    score_items = tuple(sorted(compliance_score.items()))
+    
+    # 점수 차트 표시 (개선된 디자인)
+    if compliance_score:
+        st.markdown("""
+        <div class="section-header" style="margin-top: 2rem;">
+            📈 준수 점수 시각화
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # 차트 탭 생성
+        tab1, tab2 = st.tabs(["📊 막대 차트", "🎯 레이더 차트"])
+        
+        with tab1:
+            try:
+                _render_plotly_json(_build_score_chart(score_items))
+            except Exception as e:
+                st.warning(f"막대 차트 생성 중 오류: {str(e)}")
+        
+        # 레이더 차트는 사용자가 처음 요청할 때만 생성
+        st.session_state.setdefault("radar_built", False)
+        with tab2:
+            if not st.session_state.radar_built:
+                st.button(
+                    "레이더 차트 로드",
+                    on_click=lambda: st.session_state.update(radar_built=True)
+                )
+            else:
+                try:
+                    _render_plotly_json(_build_radar_chart(score_items))
+                except Exception as e:
+                    st.warning(f"레이더 차트 생성 중 오류: {str(e)}")
+    
+    # 문서 분류 및 분석 요약 (간단히)
+    finding_counts = analysis_result["finding_counts"]
+    st.markdown(_info_cards_html(
+        analysis_result.get('document_type') or 'Unknown',
+        analysis_result["analyzed_at"],
+        finding_counts["risk"],
+        finding_counts["reg"]
+    ), unsafe_allow_html=True)
+
+def _chat_message(role, content, source=""):
+    """메시지를 저장할 때 화면용 HTML을 한 번만 만들어 두고, 재실행 시에는 그대로 사용합니다."""
+    if role == "assistant":
+        rendered_html = f"""
+        <div class="result-box">
+            {content}
+        </div>
+        """
+    else:
+        rendered_html = content
+    return {"role": role, "content": content, "source": source, "rendered_html": rendered_html}
+
+@st.fragment
+def _chat_area():
+    """채팅 영역만 다시 그리는 fragment (페이지 전체를 재실행하지 않음)"""
+    if "messages" not in st.session_state:
+        st.session_state.messages = [_chat_message("assistant", "안녕하세요! 🏛️ FSEC AI 금융 보안 규제 챗봇입니다.\n\n궁금한 금융 규제 사항이 있으시면 언제든 질문해주세요! 💼")]
+
+    # 채팅 인터페이스
+    st.markdown('<div style="margin: 1rem 0;"></div>', unsafe_allow_html=True)
+    
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(
+                message.get("rendered_html", message["content"]),
+                unsafe_allow_html=message["role"] == "assistant"
+            )
+            if "source" in message and message["source"]:
+                with st.expander("📚 답변 근거 확인하기"):
+                    st.markdown(message["source"])
+
+    if prompt := st.chat_input("💬 금융 규제에 대해 질문해주세요... (예: 개인정보보호 가이드라인은?)"):
+        st.session_state.messages.append(_chat_message("user", prompt))
+        with st.chat_message("user"):
+            st.markdown(prompt)
+        with st.chat_message("assistant"):
+            with st.spinner("🔍 지능형 라우팅으로 최적 분석 중..."):
+                try:
+                    # 지능형 라우팅으로 질문 분류
+                    route = _cached_route(prompt.strip().lower(), intelligent_router) if intelligent_router else "qa_chatbot"
+                    
+                    if route == "multi_agent" and multi_agent_system:
+                        # 멀티에이전트 분석
+                        st.info("🚀 복합 분석이 감지되어 AI 멀티에이전트 시스템으로 전환합니다.")
+                        analysis_result = multi_agent_system.analyze_document(prompt)
+                        answer = analysis_result.get("final_report", "멀티에이전트 분석을 완료했습니다.")
+                        st.markdown(f"""
+                        <div class="result-box">
+                            {answer}
+                        </div>
+                        """, unsafe_allow_html=True)
+                    else:
+                        # 기본 RAG 체인 사용 - 첫 토큰부터 바로 화면에 표시
+                        response = {}
+                        answer = st.write_stream(_stream_answer(rag_chain, prompt, response)) or '답변을 생성하지 못했습니다.'
+                    
+                    source_docs = ""
+                    if route != "multi_agent" and 'response' in locals() and response.get("context"):
+                        for i, doc in enumerate(response["context"]):
+                            source_name = os.path.basename(doc.metadata.get('source', ''))
+                            page = doc.metadata.get('page', '')
+                            snippet = doc.page_content[:200].replace('\n', ' ')
+                            source_docs += f"**[출처 {i+1}] {source_name} (Page: {page})**\n"
+                            source_docs += f"> {snippet}...\n\n"
+                    
+                    if source_docs:
+                        with st.expander("📚 답변 근거 및 출처 확인하기"):
+                            st.markdown(source_docs)
+                    elif route == "multi_agent":
+                        with st.expander("🤖 멀티에이전트 분석 세부사항"):
+                            if 'analysis_result' in locals():
+                                st.json({
+                                    "문서분류": analysis_result.get("document_type", ""),
+                                    "분석단계": analysis_result.get("current_step", ""),
+                                    "위험평가": analysis_result.get("risk_assessment", {}),
+                                    "준수점수": analysis_result.get("compliance_score", {})
+                                })
+                    st.session_state.messages.append(_chat_message("assistant", answer, source_docs))
+                except Exception as e:
+                    st.error(f"답변 생성 중 오류 발생: {e}")
+
+
 if rag_chain:
     if page == "🤖 금융 보안 규제 QA 챗봇":
         st.markdown("""
@@ -367,80 +636,7 @@ if rag_chain:
         </div>
         """.format("규제 문서"), unsafe_allow_html=True)
 
-        if "messages" not in st.session_state:
-            st.session_state.messages = [{"role": "assistant", "content": "안녕하세요! 🏛️ FSEC AI 금융 보안 규제 챗봇입니다.\n\n궁금한 금융 규제 사항이 있으시면 언제든 질문해주세요! 💼"}]
-
-        # 채팅 인터페이스
-        st.markdown('<div style="margin: 1rem 0;"></div>', unsafe_allow_html=True)
-        
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                if message["role"] == "assistant":
-                    st.markdown(f"""
-                    <div class="result-box">
-                        {message["content"]}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(message["content"])
-                    
-                if "source" in message and message["source"]:
-                    with st.expander("📚 답변 근거 확인하기"):
-                        st.markdown(message["source"])
-
-        if prompt := st.chat_input("💬 금융 규제에 대해 질문해주세요... (예: 개인정보보호 가이드라인은?)"):
-            st.session_state.messages.append({"role": "user", "content": prompt})
-            with st.chat_message("user"):
-                st.markdown(prompt)
-            with st.chat_message("assistant"):
-                with st.spinner("🔍 지능형 라우팅으로 최적 분석 중..."):
-                    try:
-                        # 지능형 라우팅으로 질문 분류
-                        route = intelligent_router(prompt) if intelligent_router else "qa_chatbot"
-                        
-                        if route == "multi_agent" and multi_agent_system:
-                            # 멀티에이전트 분석
-                            st.info("🚀 복합 분석이 감지되어 AI 멀티에이전트 시스템으로 전환합니다.")
-                            analysis_result = multi_agent_system.analyze_document(prompt)
-                            answer = analysis_result.get("final_report", "멀티에이전트 분석을 완료했습니다.")
-                        else:
-                            # 기본 RAG 체인 사용
-                            response = rag_chain.invoke({"input": prompt})
-                            answer = response.get('answer', '답변을 생성하지 못했습니다.')
-                        
-                        st.markdown(f"""
-                        <div class="result-box">
-                            {answer}
-                        </div>
-                        """, unsafe_allow_html=True)
-                        source_docs = ""
-                        if route != "multi_agent" and 'response' in locals() and response.get("context"):
-                            for i, doc in enumerate(response["context"]):
-                                source_name = os.path.basename(doc.metadata.get('source', ''))
-                                page = doc.metadata.get('page', '')
-                                snippet = doc.page_content[:200].replace('\n', ' ')
-                                source_docs += f"**[출처 {i+1}] {source_name} (Page: {page})**\n"
-                                source_docs += f"> {snippet}...\n\n"
-                        
-                        if source_docs:
-                            with st.expander("📚 답변 근거 및 출처 확인하기"):
-                                st.markdown(source_docs)
-                        elif route == "multi_agent":
-                            with st.expander("🤖 멀티에이전트 분석 세부사항"):
-                                if 'analysis_result' in locals():
-                                    st.json({
-                                        "문서분류": analysis_result.get("document_type", ""),
-                                        "분석단계": analysis_result.get("current_step", ""),
-                                        "위험평가": analysis_result.get("risk_assessment", {}),
-                                        "준수점수": analysis_result.get("compliance_score", {})
-                                    })
-                        st.session_state.messages.append({
-                            "role": "assistant",
-                            "content": answer,
-                            "source": source_docs if source_docs else ""
-                        })
-                    except Exception as e:
-                        st.error(f"답변 생성 중 오류 발생: {e}")
+        _chat_area()
 
     elif page == "🔒 보안 적정성 평가":
         st.markdown("""
@@ -487,13 +683,17 @@ if rag_chain:
         if uploaded_file or input_text.strip():
             with st.spinner("🔍 보안 적정성 평가 중입니다..."):
                 try:
+                    pdf_documents = []
                     if uploaded_file:
+                        # PDF는 여기서 한 번만 추출해 평가와 웹 검색 키워드에 함께 사용
+                        file_hash = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+                        pdf_documents, pdf_chunks = _split_pdf_cached(file_hash, uploaded_file.getvalue(), uploaded_file.name)
                         assessment, assessment_sources = security_assessment_content(
-                            None, embedding_model, is_pdf=True, uploaded_file=uploaded_file
+                            None, embedding_model, pdf=(file_hash, pdf_documents, pdf_chunks)
                         )
                     else:
                         assessment, assessment_sources = security_assessment_content(
-                            input_text.strip(), embedding_model, is_pdf=False
+                            input_text.strip(), embedding_model
                         )
                     
                     st.markdown("""
@@ -514,22 +714,13 @@ if rag_chain:
                         # Tavily 검색 결과가 있다면 추가 정보 표시
                         if TAVILY_API_KEY:
                             with st.expander("🌐 웹에서 검색된 최신 규제 정보"):
+                                # 평가 때와 같은 검색어를 써서 캐시된 검색 결과를 재사용
                                 if uploaded_file:
-                                    # PDF 내용에서 키워드 추출해서 검색
-                                    temp_dir = "temp"
-                                    os.makedirs(temp_dir, exist_ok=True)
-                                    temp_path = os.path.join(temp_dir, uploaded_file.name)
-                                    with open(temp_path, "wb") as f:
-                                        f.write(uploaded_file.getbuffer())
-                                    loader = PyPDFLoader(temp_path)
-                                    docs = loader.load()
-                                    if docs:
-                                        search_keywords = docs[0].page_content[:200]
-                                        web_info = search_additional_info(search_keywords, TAVILY_API_KEY)
-                                        st.markdown(web_info)
+                                    source_text = pdf_documents[0].page_content if pdf_documents else ""
                                 else:
-                                    web_info = search_additional_info(input_text.strip()[:200], TAVILY_API_KEY)
-                                    st.markdown(web_info)
+                                    source_text = input_text.strip()
+                                if source_text:
+                                    st.markdown(search_additional_info(_doc_keywords(source_text), TAVILY_API_KEY))
                 except Exception as e:
                     st.error(f"평가 생성 중 오류 발생: {e}")
         else:
@@ -581,8 +772,8 @@ if rag_chain:
         st.markdown("""
         <div class="info-card">
             <p style="margin: 0; color: #64748b;">
-                🤖 6개의 전문 AI 에이전트가 협업하여 종합적인 규제 분석을 수행합니다.<br>
-                📊 문서 분류 → 1차 분석 → 위험도 평가 → 웹 검색 → 준수 점수 → 최종 보고서
+                🤖 5개의 전문 AI 에이전트가 협업하여 종합적인 규제 분석을 수행합니다.<br>
+                📊 문서 분류·1차 분석 → 위험도 평가 + 웹 검색 → 준수 점수 → 최종 보고서
             </p>
         </div>
         """, unsafe_allow_html=True)
@@ -613,19 +804,13 @@ if rag_chain:
                 )
                 
                 if uploaded_file:
-                    # PDF 내용 추출
-                    temp_dir = "temp"
-                    os.makedirs(temp_dir, exist_ok=True)
-                    temp_path = os.path.join(temp_dir, uploaded_file.name)
-                    with open(temp_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-                    
-                    from langchain_community.document_loaders import PyPDFLoader
-                    loader = PyPDFLoader(temp_path)
-                    documents = loader.load()
-                    content_to_analyze = "\n".join([doc.page_content for doc in documents[:5]])  # 처음 5페이지만
+                    # PDF 내용 추출 (디스크에 쓰지 않고 메모리에서 바로 파싱)
+                    content_to_analyze = "\n".join(_lazy_pages(uploaded_file.getvalue(), 5))  # 처음 5페이지만
             
             if content_to_analyze.strip():
+                # 입력 내용 해시로 세션에 저장된 결과를 다시 보여줄지 판단 (버튼을 누르면 항상 분석 실행,
+                # 이미 끝난 단계는 체크포인트에서 재사용하므로 실패한 분석도 다시 시도할 수 있음)
+                input_hash = hashlib.blake2b(content_to_analyze.encode(), digest_size=16).hexdigest()
                 if st.button("🚀 멀티에이전트 분석 시작", type="primary"):
                     with st.spinner("🤖 AI 에이전트들이 협업하여 분석 중입니다..."):
                         
@@ -633,273 +818,130 @@ if rag_chain:
                         progress_bar = st.progress(0)
                         status_text = st.empty()
                         step_info = st.empty()
+                        report_preview = st.empty()
+                        report_parts = []
                         
-                        # 에이전트 단계별 진행 표시
-                        steps = [
-                            "🔍 문서 분류 에이전트 작동 중...",
-                            "📊 1차 분석 에이전트 분석 중...",
-                            "⚠️ 위험도 평가 에이전트 평가 중...",
-                            "🌐 웹 검색 에이전트 정보 수집 중...",
-                            "📈 점수 계산 에이전트 점수 산출 중...",
-                            "📝 보고서 생성 에이전트 최종 보고서 작성 중..."
-                        ]
-                        
-                        # 분석 실행
-                        import time
-                        analysis_result = None
+                        # 에이전트가 끝날 때마다 실제 진행 상황을 표시
+                        def _on_step(name, idx, total):
+                            progress_bar.progress(int((idx + 1) / total * 100))
+                            step_info.info(f"✅ {name}")
                         
-                        for i, step in enumerate(steps):
-                            progress = int((i + 1) / len(steps) * 85)  # 85%까지만
-                            progress_bar.progress(progress)
-                            step_info.info(step)
-                            time.sleep(0.3)  # 시각적 효과
+                        # 최종 보고서는 생성되는 대로 미리 보여줌
+                        def _on_report_token(text):
+                            report_parts.append(text)
+                            report_preview.markdown("".join(report_parts))
                         
-                        # 실제 분석 실행
-                        analysis_result = multi_agent_system.analyze_document(content_to_analyze)
+                        input_sections = _agent_input_sections(content_to_analyze, embedding_model)
+                        st.session_state.analysis_result = multi_agent_system.analyze_document(
+                            content_to_analyze, on_step=_on_step, input_sections=input_sections,
+                            report_callback=_on_report_token,
+                            # 같은 문서를 다시 분석하면 저장된 단계별 결과를 이어서 사용
+                            thread_id=input_hash
+                        )
+                        st.session_state.last_hash = input_hash
                         
                         # 완료 처리
                         progress_bar.progress(100)
-                        step_info.success("🎉 6개 AI 에이전트 협업 분석 완료!")
+                        step_info.success("🎉 5개 AI 에이전트 협업 분석 완료!")
                         status_text.success("✅ 종합 분석 보고서가 생성되었습니다!")
-                        
-                        # 완료 효과
-                        time.sleep(0.5)
                         progress_bar.empty()
                         step_info.empty()
-                        
-                        # 결과 표시
-                        if analysis_result.get("error_message"):
-                            st.error(f"⚠️ 분석 중 오류 발생: {analysis_result['error_message']}")
-                        else:
-                            # 최종 보고서
-                            st.markdown("""
-                            <div class="section-header">
-                                📋 종합 분석 보고서
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            st.markdown(f"""
-                            <div class="result-box">
-                                {analysis_result.get('final_report', '보고서 생성 실패')}
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # 전체 점수 하이라이트
-                            if analysis_result.get("compliance_score", {}).get("전체점수"):
-                                overall_data = analysis_result["compliance_score"]["전체점수"]
-                                overall_score = overall_data.get("점수", 0)
-                                overall_grade = overall_data.get("등급", "미평가")
-                                
-                                # 점수에 따른 색상 설정
-                                if overall_score >= 90:
-                                    score_color = "#16a34a"  # 녹색
-                                    bg_color = "#f0fdf4"
-                                elif overall_score >= 80:
-                                    score_color = "#3b82f6"  # 파란색
-                                    bg_color = "#eff6ff"
-                                elif overall_score >= 70:
-                                    score_color = "#f59e0b"  # 주황색
-                                    bg_color = "#fffbeb"
-                                else:
-                                    score_color = "#dc2626"  # 빨간색
-                                    bg_color = "#fef2f2"
-                                
-                                st.markdown(f"""
-                                <div style="
-                                    background: linear-gradient(135deg, {bg_color} 0%, white 100%);
-                                    border: 2px solid {score_color};
-                                    border-radius: 15px;
-                                    padding: 2rem;
-                                    text-align: center;
-                                    margin: 2rem 0;
-                                    box-shadow: 0 8px 25px rgba(0,0,0,0.1);
-                                ">
-                                    <h1 style="color: {score_color}; margin: 0; font-size: 3rem; font-weight: 800;">
-                                        {overall_score}점
-                                    </h1>
-                                    <h3 style="color: {score_color}; margin: 0.5rem 0; font-size: 1.5rem;">
-                                        등급: {overall_grade}
-                                    </h3>
-                                    <p style="color: #64748b; margin: 0; font-size: 1.1rem;">
-                                        전체 규제 준수 점수
-                                    </p>
-                                </div>
-                                """, unsafe_allow_html=True)
-                            
-                            # 카테고리별 점수 카드
-                            if analysis_result.get("compliance_score"):
-                                st.markdown("""
-                                <div class="section-header" style="margin-top: 2rem;">
-                                    📊 카테고리별 준수 점수
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # 점수 데이터 준비
-                                score_cards = []
-                                for category, data in analysis_result["compliance_score"].items():
-                                    if category != "전체점수" and isinstance(data, dict) and "점수" in data:
-                                        score_cards.append({
-                                            "category": category,
-                                            "score": data["점수"],
-                                            "grade": data.get("등급", ""),
-                                            "reason": data.get("사유", "")
-                                        })
-                                
-                                # 2x2 그리드로 카드 배치
-                                if len(score_cards) >= 4:
-                                    cols = st.columns(2)
-                                    for i, card in enumerate(score_cards):
-                                        with cols[i % 2]:
-                                            _render_score_card(card)
-                                else:
-                                    cols = st.columns(len(score_cards))
-                                    for i, card in enumerate(score_cards):
-                                        with cols[i]:
-                                            _render_score_card(card)
-                            
-                            # 점수 차트 표시 (개선된 디자인)
-                            if analysis_result.get("compliance_score"):
-                                st.markdown("""
-                                <div class="section-header" style="margin-top: 2rem;">
-                                    📈 준수 점수 시각화
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # 차트 탭 생성
-                                tab1, tab2 = st.tabs(["📊 막대 차트", "🎯 레이더 차트"])
-                                
-                                with tab1:
-                                    try:
-                                        chart = multi_agent_system.create_score_chart(analysis_result["compliance_score"])
-                                        st.plotly_chart(chart, use_container_width=True)
-                                    except Exception as e:
-                                        st.warning(f"막대 차트 생성 중 오류: {str(e)}")
-                                
-                                with tab2:
-                                    try:
-                                        radar_chart = multi_agent_system.create_radar_chart(analysis_result["compliance_score"])
-                                        st.plotly_chart(radar_chart, use_container_width=True)
-                                    except Exception as e:
-                                        st.warning(f"레이더 차트 생성 중 오류: {str(e)}")
-                            
-                            # 문서 분류 및 분석 요약 (간단히)
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.markdown("""
-                                <div class="info-card">
-                                    <h4 style="color: #1e40af; margin-top: 0;">📑 분석 정보</h4>
-                                    <p style="margin: 0; color: #374151;">
-                                        <strong>문서 유형:</strong> {}<br>
-                                        <strong>분석 일시:</strong> {}<br>
-                                        <strong>분석 에이전트:</strong> 6개 AI 협업
-                                    </p>
-                                </div>
-                                """.format(
-                                    analysis_result.get('document_type', 'Unknown'),
-                                    pd.Timestamp.now().strftime("%Y-%m-%d %H:%M")
-                                ), unsafe_allow_html=True)
-                            
-                            with col2:
-                                # 주요 발견사항 요약
-                                primary_analysis = analysis_result.get("primary_analysis", {})
-                                risk_count = len(primary_analysis.get("위험요소", []))
-                                regulation_count = len(primary_analysis.get("규제관련사항", []))
-                                
-                                st.markdown(f"""
-                                <div class="info-card">
-                                    <h4 style="color: #dc2626; margin-top: 0;">🔍 발견사항 요약</h4>
-                                    <p style="margin: 0; color: #374151;">
-                                        <strong>위험요소:</strong> {risk_count}개 발견<br>
-                                        <strong>규제사항:</strong> {regulation_count}개 확인<br>
-                                        <strong>웹검색:</strong> 최신 정보 반영
-                                    </p>
-                                </div>
-                                """, unsafe_allow_html=True)
-            else:
-                st.markdown("""
-                <div class="info-card">
-                    <h4 style="color: #1e40af; margin-top: 0;">🚀 멀티에이전트 분석 시작하기</h4>
-                    <p style="margin: 0; color: #64748b;">
-                        위에서 분석 방법을 선택하고 내용을 입력한 후 분석을 시작하세요.
-                    </p>
-                </div>
-                """, unsafe_allow_html=True)
+                        report_preview.empty()
                 
-                # 시스템 아키텍처 설명
-                st.markdown("### 🔧 시스템 아키텍처")
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
+                # 결과 표시 (레이더 차트 로드 버튼 등으로 재실행돼도 결과가 유지되도록 세션에서 읽음)
+                analysis_result = st.session_state.get("analysis_result")
+                if analysis_result and st.session_state.get("last_hash") == input_hash:
+                    # 일부 에이전트가 실패해도 생성된 보고서(실패 보고서 포함)는 항상 보여주고 오류는 그 위에 경고로 표시
+                    if analysis_result.get("error_message"):
+                        st.warning(f"⚠️ 분석 중 오류 발생: {analysis_result['error_message']}")
+                    
+                    # 최종 보고서
                     st.markdown("""
-                    <div class="info-card">
-                        <h4 style="color: #16a34a; margin-top: 0;">🤖 AI 에이전트</h4>
-                        <ul style="margin: 0; padding-left: 1rem; color: #374151;">
-                            <li>📋 문서 분류 에이전트</li>
-                            <li>🔍 1차 분석 에이전트</li>
-                            <li>⚠️ 위험도 평가 에이전트</li>
-                            <li>🌐 웹 검색 에이전트</li>
-                            <li>📊 점수 계산 에이전트</li>
-                            <li>📝 보고서 생성 에이전트</li>
-                        </ul>
+                    <div class="section-header">
+                        📋 종합 분석 보고서
                     </div>
                     """, unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown("""
-                    <div class="info-card">
-                        <h4 style="color: #dc2626; margin-top: 0;">📊 분석 항목</h4>
-                        <ul style="margin: 0; padding-left: 1rem; color: #374151;">
-                            <li>개인정보보호</li>
-                            <li>데이터보안</li>
-                            <li>접근제어</li>
-                            <li>규제준수</li>
-                            <li>전체위험도</li>
-                        </ul>
+                    
+                    st.markdown(f"""
+                    <div class="result-box">
+                        {analysis_result.get('final_report', '보고서 생성 실패')}
                     </div>
                     """, unsafe_allow_html=True)
+                    
+                    # 점수 데이터를 한 번만 구해 아래에서 재사용
+                    compliance_score = analysis_result.get("compliance_score") or {}
+                    
+                    # 전체 점수 하이라이트
+                    if compliance_score.get("전체점수"):
+                        overall_data = compliance_score["전체점수"]
+                        overall_score = overall_data.get("점수", 0)
+                        overall_grade = overall_data.get("등급", "미평가")
+                        
+                        score_color, bg_color = _score_palette(overall_score)
+                        
+                        st.markdown(f"""
+                        <div style="
+                            background: linear-gradient(135deg, {bg_color} 0%, white 100%);
+                            border: 2px solid {score_color};
+                            border-radius: 15px;
+                            padding: 2rem;
+                            text-align: center;
+                            margin: 2rem 0;
+                            box-shadow: 0 8px 25px rgba(0,0,0,0.1);
+                        ">
+                            <h1 style="color: {score_color}; margin: 0; font-size: 3rem; font-weight: 800;">
+                                {overall_score}점
+                            </h1>
+                            <h3 style="color: {score_color}; margin: 0.5rem 0; font-size: 1.5rem;">
+                                등급: {overall_grade}
+                            </h3>
+                            <p style="color: #64748b; margin: 0; font-size: 1.1rem;">
+                                전체 규제 준수 점수
+                            </p>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    
+                    # 카테고리별 점수 카드
+                    if compliance_score:
+                        st.markdown("""
+                        <div class="section-header" style="margin-top: 2rem;">
+                            📊 카테고리별 준수 점수
+                        </div>
+                        """, unsafe_allow_html=True)
+                        
+                        # 점수 데이터 준비
+                        score_cards = []
+                        for category, data in compliance_score.items():
+                            if category != "전체점수" and isinstance(data, dict) and "점수" in data:
+                                score_cards.append({
+                                    "category": category,
+                                    "score": data["점수"],
+                                    "grade": data.get("등급", ""),
+                                    "reason": data.get("사유", "")
+                                })
+                        
+                        # 2x2 그리드로 카드 배치
+                        if len(score_cards) >= 4:
+                            cols = st.columns(2)
+                            for i, card in enumerate(score_cards):
+                                with cols[i % 2]:
+                                    _render_score_card(card)
+                        else:
+                            cols = st.columns(len(score_cards))
+                            for i, card in enumerate(score_cards):
+                                with cols[i]:
+                                    _render_score_card(card)
+                    
+                    # 점수 시각화와 요약 카드 (fragment로 분리)
+                    _render_results(analysis_result)
+            else:
+                st.markdown(_HTML_ANALYSIS_START, unsafe_allow_html=True)
                 
-                with col3:
-                    st.markdown("""
-                    <div class="info-card">
-                        <h4 style="color: #f59e0b; margin-top: 0;">📈 결과물</h4>
-                        <ul style="margin: 0; padding-left: 1rem; color: #374151;">
-                            <li>종합 분석 보고서</li>
-                            <li>점수 시각화 차트</li>
-                            <li>위험도 평가 결과</li>
-                            <li>개선 권장사항</li>
-                            <li>최신 규제 정보</li>
-                        </ul>
-                    </div>
-                    """, unsafe_allow_html=True)
+                # 시스템 아키텍처 설명
+                st.markdown("### 🔧 시스템 아키텍처")
+                st.markdown(_HTML_ARCHITECTURE_CARDS, unsafe_allow_html=True)
         else:
             st.error("멀티에이전트 시스템이 초기화되지 않았습니다. API 키를 확인해주세요.")
 
 else:
-    st.markdown("""
-    <div class="section-header">
-        ⚠️ API 키 설정이 필요합니다
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("""
-    <div class="info-card">
-        <h4 style="color: #dc2626; margin-top: 0;">🔧 설정 방법</h4>
-        <ol style="color: #374151; margin: 0;">
-            <li>프로젝트 폴더에 <code>.env</code> 파일을 생성하세요</li>
-            <li>파일에 다음과 같이 작성하세요:</li>
-        </ol>
-        <div style="background: #f1f5f9; padding: 1rem; border-radius: 8px; margin: 1rem 0; font-family: monospace;">
-            OPENAI_API_KEY=your_api_key_here<br>
-            TAVILY_API_KEY=your_tavily_api_key_here  # 웹 검색 기능용 (선택)
-        </div>
-        <ol start="3" style="color: #374151; margin: 0;">
-            <li>앱을 다시 시작하세요</li>
-        </ol>
-        
-        <div style="margin-top: 1rem; padding: 1rem; background: #fef3c7; border-radius: 8px; border-left: 4px solid #f59e0b;">
-            <p style="margin: 0; color: #92400e;">
-                💡 <strong>참고:</strong> Tavily API는 선택사항입니다. OPENAI_API_KEY만 있어도 기본 기능은 모두 사용 가능합니다.
-            </p>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown(_HTML_API_KEY_GUIDE, unsafe_allow_html=True)
\ No newline at end of file
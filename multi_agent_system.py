@@ -4,27 +4,633 @@ LangGraph를 사용한 고도화된 분석 워크플로우
 """
 
 import os
-from typing import Dict, List, Any, TypedDict
-from langchain_openai import ChatOpenAI
+import re
+import asyncio
+import functools
+import hashlib
+import queue
+import sqlite3
+import threading
+from typing import Annotated, Dict, List, Any, TypedDict
+from pydantic import BaseModel, Field
+import faiss
+import numpy as np
+import tiktoken
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+from openai import APIConnectionError, APITimeoutError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 from langchain.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, END
-import json
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+import orjson
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
+from chatbot_core import EMBEDDING_MODEL_NAME, EMBEDDING_DIMENSIONS
+
+try:
+    from tavily import TavilyClient
+except ImportError:  # 웹 검색은 선택 기능
+    TavilyClient = None
+
+
+# 에이전트 한 번에 넘기는 원문 길이 상한 (토큰 수, 한국어는 문자 수보다 토큰이 많음)
+MAX_INPUT_TOKENS = 1500
+# 긴 문서에서 에이전트별로 관련 조각을 고르기 위한 검색 질의
+AGENT_TASK_HINTS = {
+    "document_analyzer": "문서의 목적과 적용 대상, 규제 준수 의무, 개인정보 수집 이용 제공 파기, 암호화 접근통제 보안조치, 위험 요소와 책임",
+}
+# 비슷한 입력에 대한 에이전트 응답을 재사용하는 시맨틱 캐시
+SEMANTIC_CACHE_PATH = "./semantic_cache.db"
+SEMANTIC_CACHE_THRESHOLD = 0.92  # 코사인 유사도가 이 값을 넘으면 저장된 응답 사용
+# 입력이 점수·JSON인 노드는 숫자 하나만 달라도 임베딩이 거의 같으므로 입력이 완전히 같을 때만 재사용
+EXACT_CACHE_NODES = frozenset({"risk_assessor", "report_generator"})
+# 같은 문서를 다시 분석할 때 끝난 에이전트를 건너뛰기 위한 단계별 결과 저장소
+CHECKPOINT_PATH = "./compliance_state.db"
+# 보고서 생성 노드의 오류 메시지 접두어 (체크포인트 재개 시 보고서만 다시 만들지 판단)
+_REPORT_ERROR_PREFIX = "보고서 생성 오류"
+# 시스템 프롬프트를 바꾸면 버전을 올려 OpenAI 프롬프트 캐시 키를 분리
+PROMPT_CACHE_VERSION = "v6"
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    """gpt-4o 토크나이저 (BPE 파일을 내려받을 수 있어 import 시점이 아닌 첫 사용 시 한 번만 로드)"""
+    return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    """gpt-4o 기준 토큰 수"""
+    return len(_encoding().encode(text))
+
+
+def _truncate_tokens(text: str, max_tokens: int = MAX_INPUT_TOKENS) -> str:
+    """문자 수가 아닌 토큰 수 기준으로 앞부분만 남김"""
+    encoding = _encoding()
+    ids = encoding.encode(text)
+    return text if len(ids) <= max_tokens else encoding.decode(ids[:max_tokens])
+
+
+def _compact_json(value: Any) -> str:
+    """프롬프트에 넣을 공백 없는 UTF-8 JSON (str(dict)보다 토큰이 적고 모델이 그대로 읽을 수 있음)
+
+    orjson은 기본 출력이 공백 없는 UTF-8이라 표준 json보다 빠르게 같은 결과를 만듭니다.
+    """
+    return orjson.dumps(value).decode()
+
+
+# 준수 점수 등급 구간: 60 미만 부족, 60대 미흡, 70대 보통, 80대 양호, 90 이상 우수
+_GRADE_THRESHOLDS = np.array([60, 70, 80, 90])
+_GRADE_LABELS = np.array(["부족", "미흡", "보통", "양호", "우수"])
+
+
+def _grade_vec(scores):
+    """점수(스칼라 또는 배열)를 등급으로 한 번에 변환"""
+    return _GRADE_LABELS[np.searchsorted(_GRADE_THRESHOLDS, scores, side="right")]
+
+
+# 분류번호 → 문서 유형 (ANALYZE_SYSTEM_PROMPT의 분류 기준과 같은 순서)
+_DOC_TYPES = {
+    1: "금융상품설명서",
+    2: "서비스약관",
+    3: "개인정보처리방침",
+    4: "보안정책",
+    5: "시스템구성도",
+    6: "기타"
+}
+
+# 보고서 템플릿에서 실제 값으로 채울 자리표시자
+_PLACEHOLDER_RE = re.compile(r"\[(현재 시간|점수|등급)\]")
+
+# 막대 차트 색상 구간: 70 미만 빨강, 70대 주황, 80대 파랑, 90 이상 녹색
+_BAR_COLOR_THRESHOLDS = np.array([70, 80, 90])
+_BAR_COLORS = np.array([
+    "rgba(220, 38, 38, 0.8)",
+    "rgba(245, 158, 11, 0.8)",
+    "rgba(59, 130, 246, 0.8)",
+    "rgba(22, 163, 74, 0.8)",
+])
+
+
+# --- 구조화 출력 스키마 (API가 스키마에 맞는 JSON을 보장하므로 파싱 실패 처리가 필요 없음) ---
+# 프롬프트·보고서에서 쓰는 한국어 키는 alias로 두고, 스키마와 JSON은 항상 alias 기준으로 주고받음
+class KeyContent(BaseModel):
+    purpose: str = Field(alias="목적")
+    scope: str = Field(alias="적용범위")
+    key_clauses: List[str] = Field(alias="핵심조항")
+
+
+class RegulatoryItems(BaseModel):
+    applicable_laws: List[str] = Field(alias="준수법령")
+    requirements: List[str] = Field(alias="규제요구사항")
+    compliance_issues: List[str] = Field(alias="컴플라이언스이슈")
+    improvements: List[str] = Field(alias="개선필요사항")
+
+
+class SecurityMeasures(BaseModel):
+    technical: List[str] = Field(alias="기술적조치")
+    administrative: List[str] = Field(alias="관리적조치")
+    physical: List[str] = Field(alias="물리적조치")
+    security_level: str = Field(alias="보안수준평가")
+
+
+class PersonalInfo(BaseModel):
+    processing: List[str] = Field(alias="처리현황")
+    legal_basis: List[str] = Field(alias="법적근거")
+    rights: List[str] = Field(alias="권리보장")
+    risk_level: str = Field(alias="위험도")
+
+
+class RiskFactors(BaseModel):
+    regulatory: List[str] = Field(alias="규제위험")
+    operational: List[str] = Field(alias="운영위험")
+    reputational: List[str] = Field(alias="평판위험")
+    priorities: List[str] = Field(alias="우선순위")
+
+
+class PrimaryAnalysis(BaseModel):
+    """1차 분석 결과"""
+    key_content: KeyContent = Field(alias="주요내용")
+    regulatory: RegulatoryItems = Field(alias="규제관련사항")
+    security: SecurityMeasures = Field(alias="보안요소")
+    personal_info: PersonalInfo = Field(alias="개인정보")
+    risk_factors: RiskFactors = Field(alias="위험요소")
+
+
+class ClassifiedAnalysis(BaseModel):
+    """문서 분류와 1차 분석을 한 번의 호출로 받는 결과"""
+    category: int = Field(alias="분류번호")
+    confidence: int = Field(alias="신뢰도")
+    analysis: PrimaryAnalysis = Field(alias="분석결과")
+
+
+class CategoryRisk(BaseModel):
+    score: int = Field(alias="점수")
+    grade: str = Field(alias="등급")
+    reason: str = Field(alias="사유")
+    key_issues: List[str] = Field(alias="주요이슈")
+    remedies: List[str] = Field(alias="개선방안")
+
+
+class OverallRisk(BaseModel):
+    score: int = Field(alias="점수")
+    grade: str = Field(alias="등급")
+    opinion: str = Field(alias="종합의견")
+    priority_actions: List[str] = Field(alias="우선개선과제")
+    expected_sanctions: List[str] = Field(alias="예상제재")
+
+
+class RiskAssessment(BaseModel):
+    """영역별 위험도 평가 결과 (점수 1-10)"""
+    privacy: CategoryRisk = Field(alias="개인정보보호")
+    data_security: CategoryRisk = Field(alias="데이터보안")
+    access_control: CategoryRisk = Field(alias="접근제어")
+    compliance: CategoryRisk = Field(alias="규제준수")
+    overall: OverallRisk = Field(alias="전체위험도")
+
+
+# 일시적인 OpenAI 오류는 지수 백오프로 재시도 (최대 4회, 1~16초 대기)
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError)
+_llm_retry = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential(min=1, max=16),
+    retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+    reraise=True
+)
+# 한 분석에서 동시에 실행할 에이전트 수 상한 (OpenAI 요청 한도 보호)
+MAX_AGENT_CONCURRENCY = 6
+# 여러 문서를 한꺼번에 분석할 때 동시에 진행할 문서 수 상한
+BATCH_MAX_CONCURRENCY = 8
+# 차트 크기를 고정해 Plotly.js의 autosize 재계산을 피함 (픽셀)
+CHART_WIDTH = 720
+CHART_HEIGHT = 420
+
+
+def _take_latest(left: str, right: str) -> str:
+    """같은 단계에서 병렬 노드가 함께 갱신해도 마지막 값을 사용"""
+    return right
+
+
+class _ReplaceErrors(str):
+    """누적하지 않고 error_message를 이 값으로 바꿀 때 사용 (체크포인트에서 일부 단계만 다시 실행할 때)"""
+
+
+def _merge_errors(left: str, right: str) -> str:
+    """병렬 노드의 오류 메시지를 모두 보존"""
+    if isinstance(right, _ReplaceErrors):
+        return str(right)
+    return "\n".join(message for message in (left, right) if message)
 
 
 class AnalysisState(TypedDict):
-    """분석 상태를 관리하는 클래스"""
+    """분석 상태를 관리하는 클래스 (노드는 변경한 항목만 반환)"""
     input_content: str
+    input_sections: Dict[str, str]
     document_type: str
     primary_analysis: Dict[str, Any]
+    finding_counts: Dict[str, int]
     risk_assessment: Dict[str, Any]
     web_search_results: Dict[str, Any]
     compliance_score: Dict[str, Any]
     final_report: str
-    current_step: str
-    error_message: str
+    analyzed_at: str
+    current_step: Annotated[str, _take_latest]
+    error_message: Annotated[str, _merge_errors]
+
+
+def _key_hash(text: str) -> str:
+    """캐시 조회용 입력 해시"""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class SemanticCache:
+    """노드별 (입력 → LLM 응답) 캐시.
+
+    응답과 임베딩은 SQLite에 저장하고, 시작할 때 노드별 FAISS IndexFlatIP로 다시 올립니다.
+    임베딩은 L2 정규화해 두므로 내적이 곧 코사인 유사도입니다.
+    임베딩 없이 저장한 항목은 입력 해시가 완전히 같을 때만 사용합니다.
+    version이 다른(프롬프트가 바뀐) 항목은 시작할 때 지웁니다.
+    """
+
+    def __init__(self, path=SEMANTIC_CACHE_PATH, threshold=SEMANTIC_CACHE_THRESHOLD, version=""):
+        self.threshold = threshold
+        self.version = version
+        # 캐시된 시스템 객체를 여러 Streamlit 세션 스레드가 함께 사용
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries (node TEXT NOT NULL, version TEXT NOT NULL, "
+                "key_hash TEXT NOT NULL, embedding BLOB, response TEXT NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM cache_entries WHERE version != ?", (version,))
+        self._indexes = {}
+        self._responses = {}
+        self._exact = {}
+        for node, key_hash, embedding, response in self._conn.execute(
+            "SELECT node, key_hash, embedding, response FROM cache_entries"
+        ):
+            vector = None if embedding is None else np.frombuffer(embedding, dtype="float32")
+            self._add_to_memory(node, key_hash, vector, response)
+
+    def _add_to_memory(self, node, key_hash, vector, response):
+        self._exact[(node, key_hash)] = response
+        if vector is None:
+            return
+        if node not in self._indexes:
+            self._indexes[node] = faiss.IndexFlatIP(EMBEDDING_DIMENSIONS)
+            self._responses[node] = []
+        self._indexes[node].add(vector.reshape(1, -1))
+        self._responses[node].append(response)
+
+    def lookup(self, node, key_text, vector=None):
+        """같은 입력의 응답을 먼저 찾고, vector가 있으면 비슷한 입력의 응답까지 찾음"""
+        with self._lock:
+            cached = self._exact.get((node, _key_hash(key_text)))
+            if cached is not None or vector is None:
+                return cached
+            index = self._indexes.get(node)
+            if index is None or index.ntotal == 0:
+                return None
+            scores, ids = index.search(vector.reshape(1, -1), 1)
+            if scores[0][0] < self.threshold:
+                return None
+            return self._responses[node][ids[0][0]]
+
+    def add(self, node, key_text, response, vector=None):
+        key_hash = _key_hash(key_text)
+        with self._lock:
+            self._add_to_memory(node, key_hash, vector, response)
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO cache_entries (node, version, key_hash, embedding, response) VALUES (?, ?, ?, ?, ?)",
+                    (node, self.version, key_hash, None if vector is None else vector.tobytes(), response),
+                )
+
+
+# 노드별 고정 지시문은 시스템 프롬프트로 분리 (입력과 무관한 앞부분을 OpenAI 프롬프트 캐시가 재사용)
+ANALYZE_SYSTEM_PROMPT = """
+당신은 금융감독원 검사국에서 15년간 근무한 시니어 금융검사관입니다.
+주어진 문서를 먼저 아래 기준에 따라 분류하고, 이어서 금융 규제 관점에서 심층 분석을 수행하세요.
+
+=== 문서 분류 기준 ===
+1. 금융상품설명서
+   - 투자위험, 수익구조, 상품특성 설명 포함
+   - 금융투자업법, 자본시장법 관련 용어 사용
+   - 투자자 보호, 투자권유, 적합성 원칙 언급
+
+2. 서비스약관
+   - 서비스 이용조건, 권리의무, 책임한계 규정
+   - 약관의 변경, 해지, 분쟁해결 절차 포함
+   - 소비자보호법, 전자상거래법 관련 내용
+
+3. 개인정보처리방침
+   - 개인정보 수집/이용/제공/파기 절차
+   - 개인정보보호법, 신용정보법 준수사항
+   - 정보주체 권리, 동의철회, 손해배상 명시
+
+4. 보안정책
+   - 정보보안 관리체계, 접근통제, 암호화
+   - 보안사고 대응, 취약점 관리, 보안교육
+   - 정보보호관리체계(ISMS), ISO27001 관련
+
+5. 시스템구성도
+   - 시스템 아키텍처, 네트워크 구성
+   - 서버/DB 구조, 보안장비 배치
+   - 기술적 보안조치, 인프라 설명
+
+6. 기타
+   - 위 카테고리에 해당하지 않는 문서
+
+=== 분석 가이드라인 ===
+
+1. 주요내용 분석 시:
+   - 문서의 핵심 목적과 적용범위 명확히 파악
+   - 이해관계자(고객, 기업, 규제기관) 관점에서 중요도 평가
+   - 비즈니스 임팩트와 규제 리스크 동시 고려
+
+2. 규제관련사항 식별 시:
+   - 금융위원회 고시, 금감원 규정 위반 가능성
+   - 금융소비자보호법, 개인정보보호법, 신용정보법 준수사항
+   - 전자금융거래법, 자본시장법 관련 의무사항
+   - 국제 규제(바젤III, GDPR 등) 영향도
+
+3. 보안요소 검토 시:
+   - 정보보호관리체계(ISMS-P) 인증 요구사항
+   - 암호화, 접근통제, 로그관리 등 기술적 조치
+   - 물리적/관리적 보안조치 적정성
+   - 보안사고 대응체계 구축 현황
+
+4. 개인정보 처리 검토 시:
+   - 수집/이용/제공/파기 각 단계별 적법성
+   - 동의 획득 절차와 고지사항 충족성
+   - 개인정보 영향평가 대상 여부 판단
+   - 정보주체 권리 보장 메커니즘
+
+5. 위험요소 평가 시:
+   - 규제 위반으로 인한 제재 위험 (과태료, 영업정지 등)
+   - 평판 리스크와 고객 신뢰도 손상 가능성
+   - 시스템 장애나 보안사고 발생 시 파급효과
+   - 경쟁사 대비 컴플라이언스 수준 격차
+
+=== 출력 형식 (JSON) ===
+{{
+    "분류번호": 1-6,
+    "신뢰도": 1-10,
+    "분석결과": {{
+        "주요내용": {{
+            "목적": "문서의 핵심 목적",
+            "적용범위": "적용 대상과 범위",
+            "핵심조항": ["중요한 조항 3-5개"]
+        }},
+        "규제관련사항": {{
+            "준수법령": ["관련 법령명"],
+            "규제요구사항": ["구체적 요구사항"],
+            "컴플라이언스이슈": ["발견된 이슈"],
+            "개선필요사항": ["개선이 필요한 부분"]
+        }},
+        "보안요소": {{
+            "기술적조치": ["암호화, 접근통제 등"],
+            "관리적조치": ["정책, 절차, 교육 등"],
+            "물리적조치": ["시설보안, 출입통제 등"],
+            "보안수준평가": "상/중/하"
+        }},
+        "개인정보": {{
+            "처리현황": ["수집/이용/제공/파기 현황"],
+            "법적근거": ["처리 법적 근거"],
+            "권리보장": ["정보주체 권리 보장 현황"],
+            "위험도": "상/중/하"
+        }},
+        "위험요소": {{
+            "규제위험": ["규제 위반 가능성"],
+            "운영위험": ["시스템/프로세스 리스크"],
+            "평판위험": ["이미지 손상 요소"],
+            "우선순위": ["즉시해결/단기개선/중장기과제"]
+        }}
+    }}
+}}
+
+반드시 JSON 형식으로만 답변하고, 각 항목은 구체적이고 실무적으로 작성하세요.
+"""
+
+RISK_SYSTEM_PROMPT = """
+당신은 Big4 회계법인의 리스크 어드바이저리 파트너로서 10년간 금융회사 리스크 관리를 전담했습니다.
+아래 JSON으로 주어진 분석 결과를 참고하여 정량적 위험도 평가를 실시하세요.
+
+=== 위험도 평가 방법론 ===
+
+각 영역별로 다음 기준에 따라 1-10점으로 평가하세요:
+- 1-2점: 모범사례 수준 (업계 상위 10%)
+- 3-4점: 우수 수준 (규제 요구사항 완벽 충족)
+- 5-6점: 적정 수준 (기본 요구사항 충족)
+- 7-8점: 미흡 수준 (일부 개선 필요)
+- 9-10점: 위험 수준 (즉시 조치 필요)
+
+=== 평가 영역별 세부 기준 ===
+
+1. 개인정보보호 (GDPR, 개인정보보호법 기준)
+   - 수집/이용 목적의 명확성과 최소수집 원칙 준수
+   - 동의 획득 절차의 적법성 (명시적/선택적 동의)
+   - 개인정보 처리위탁 관리 체계
+   - 정보주체 권리 행사 절차 구비
+   - 개인정보 유출 시 대응체계
+   평가항목: 법적 근거, 동의 체계, 처리 위탁, 권리 보장, 사고 대응
+
+2. 데이터보안 (ISMS-P, ISO27001 기준)
+   - 암호화 적용 범위와 강도 (전송/저장)
+   - 데이터 분류 체계와 보호 조치
+   - 백업 및 복구 체계
+   - 데이터 생명주기 관리
+   - 클라우드/외부 보관 시 보안 조치
+   평가항목: 암호화, 분류 체계, 백업/복구, 생명주기, 외부 보관
+
+3. 접근제어 (최소권한 원칙)
+   - 사용자 인증 체계 (다중 인증 포함)
+   - 권한 부여 및 관리 절차
+   - 관리자 계정 보안 조치
+   - 접근 로그 모니터링 체계
+   - 권한 정기 검토 프로세스
+   평가항목: 인증 체계, 권한 관리, 관리자 보안, 로그 관리, 정기 검토
+
+4. 규제준수 (금융 규제 전반)
+   - 관련 법령 식별 완성도
+   - 규제 요구사항 이행 수준
+   - 내부 통제 체계 구축
+   - 컴플라이언스 모니터링 체계
+   - 규제 변화 대응 체계
+   평가항목: 법령 준수, 요구사항 이행, 내부 통제, 모니터링, 변화 대응
+
+=== 출력 형식 (JSON) ===
+{{
+    "개인정보보호": {{
+        "점수": [1-10],
+        "등급": "모범/우수/적정/미흡/위험",
+        "사유": "구체적 평가 근거 (법령 조항 포함)",
+        "주요이슈": ["발견된 주요 이슈 2-3개"],
+        "개선방안": ["즉시 개선 방안 2-3개"]
+    }},
+    "데이터보안": {{
+        "점수": [1-10],
+        "등급": "모범/우수/적정/미흡/위험",
+        "사유": "구체적 평가 근거 (보안 표준 포함)",
+        "주요이슈": ["발견된 주요 이슈 2-3개"],
+        "개선방안": ["즉시 개선 방안 2-3개"]
+    }},
+    "접근제어": {{
+        "점수": [1-10],
+        "등급": "모범/우수/적정/미흡/위험",
+        "사유": "구체적 평가 근거",
+        "주요이슈": ["발견된 주요 이슈 2-3개"],
+        "개선방안": ["즉시 개선 방안 2-3개"]
+    }},
+    "규제준수": {{
+        "점수": [1-10],
+        "등급": "모범/우수/적정/미흡/위험",
+        "사유": "구체적 평가 근거 (관련 법령 명시)",
+        "주요이슈": ["발견된 주요 이슈 2-3개"],
+        "개선방안": ["즉시 개선 방안 2-3개"]
+    }},
+    "전체위험도": {{
+        "점수": [1-10],
+        "등급": "모범/우수/적정/미흡/위험",
+        "종합의견": "전체적인 위험 수준에 대한 종합 의견",
+        "우선개선과제": ["가장 시급한 개선 과제 3개"],
+        "예상제재": ["위험도별 예상 제재 수준"]
+    }}
+}}
+
+반드시 JSON 형식으로 답변하고, 모든 평가는 구체적 근거와 함께 제시하세요.
+"""
+
+REPORT_SYSTEM_PROMPT = """
+당신은 금융감독원 전자검사팀에서 10년간 근무한 수석 검사관입니다.
+아래 JSON으로 주어진 분석 결과를 참고하여 임원진과 이사회에 제출할 수준의 전문적인 종합 보고서를 작성하세요.
+
+=== 보고서 작성 지침 ===
+
+1. 임원진 관점 고려사항:
+   - 규제 위반 시 발생 가능한 과태료 및 제재 조치
+   - 기업 이미지와 고객 신뢰도에 미치는 영향
+   - 경쟁사 대비 컴플라이언스 수준과 차별화 요소
+   - 투자 우선순위와 예산 배정을 위한 구체적 근거
+
+2. 이사회 보고 수준:
+   - 정량적 지표 중심의 객관적 평가
+   - 법적 리스크의 재무적 영향 분석
+   - 단계별 개선 로드맵과 예상 소요 기간
+   - 업계 모범사례 및 벤치마킹 결과
+
+3. 실무진 액션플랜:
+   - 즉시 조치 가능한 단기 개선과제 (1-3개월)
+   - 시스템 개선이 필요한 중기 과제 (3-12개월)
+   - 정책/프로세스 고도화 장기 과제 (1-2년)
+   - 각 과제별 담당 부서와 예상 비용
+
+=== 보고서 구조 (Executive Summary 스타일) ===
+
+## 🏛️ 규제 준수 종합 분석 보고서
+
+### 📋 Executive Summary
+**문서명**: [문서 유형] 규제 준수 분석
+**분석일시**: [현재 시간]
+**전체 준수 점수**: [점수]/100점 ([등급])
+**종합 의견**: [전체적인 준수 수준에 대한 한 줄 요약]
+
+### 🎯 주요 발견사항 (Key Findings)
+**1. 핵심 준수 이슈**
+- [가장 중요한 컴플라이언스 이슈 2-3개]
+
+**2. 규제 위험도 평가**
+- 개인정보보호: [점수]점 ([등급]) - [주요 이슈]
+- 데이터보안: [점수]점 ([등급]) - [주요 이슈]
+- 접근제어: [점수]점 ([등급]) - [주요 이슈]
+- 규제준수: [점수]점 ([등급]) - [주요 이슈]
+
+**3. 규제 환경 변화**
+- [최신 규제 동향과 우리 기업에 미치는 영향]
+
+### ⚠️ 위험 요소 및 영향 분석 (Risk Assessment)
+**1. 즉시 조치 필요 (Critical)**
+- [9-10점 위험 요소들] → 예상 제재: [구체적 제재 수준]
+
+**2. 단기 개선 필요 (High)**
+- [7-8점 위험 요소들] → 예상 영향: [비즈니스 영향도]
+
+**3. 중장기 관리 필요 (Medium)**
+- [5-6점 위험 요소들] → 관리 방향: [개선 방향성]
+
+### 📋 Action Plan (실행 계획)
+**1. 즉시 실행 (1-30일)**
+- [ ] [구체적 액션 아이템 1] - 담당: [부서] - 비용: [예상 비용]
+- [ ] [구체적 액션 아이템 2] - 담당: [부서] - 비용: [예상 비용]
+
+**2. 단기 실행 (1-6개월)**
+- [ ] [구체적 액션 아이템 1] - 담당: [부서] - 비용: [예상 비용]
+- [ ] [구체적 액션 아이템 2] - 담당: [부서] - 비용: [예상 비용]
+
+**3. 중장기 실행 (6-24개월)**
+- [ ] [구체적 액션 아이템 1] - 담당: [부서] - 비용: [예상 비용]
+- [ ] [구체적 액션 아이템 2] - 담당: [부서] - 비용: [예상 비용]
+
+### 💰 투자 우선순위 및 예산 가이드
+**1. 필수 투자 (ROI: 즉시)**
+- [규제 위반 방지를 위한 필수 투자 항목들]
+
+**2. 권장 투자 (ROI: 6-12개월)**
+- [경쟁 우위 확보를 위한 권장 투자 항목들]
+
+**3. 선택 투자 (ROI: 12-24개월)**
+- [미래 대비를 위한 선택적 투자 항목들]
+
+### 🔄 지속적 모니터링 체계
+**1. 정기 점검 주기**
+- 월간: [월간 점검 항목]
+- 분기: [분기 점검 항목]
+- 연간: [연간 점검 항목]
+
+**2. KPI 및 성과지표**
+- [측정 가능한 성과지표 3-5개]
+
+### 📚 참고 규제 및 가이드라인
+- [관련 법령 및 규정 목록]
+- [업계 모범사례 및 벤치마크]
+- [최신 규제 동향 정보]
+
+---
+**보고서 작성**: 금융감독 AI 시스템
+**검토 필요**: 컴플라이언스팀, 법무팀, 정보보호팀
+**승인 라인**: 부서장 → 임원진 → 이사회
+
+=== 작성 시 주의사항 ===
+- 모든 위험도 점수는 구체적 수치로 명시
+- 예상 제재나 비용은 현실적 범위로 제시
+- 액션 아이템은 실행 가능한 수준으로 구체화
+- 담당 부서는 일반적인 조직 구조 기준으로 제시
+- 법령명과 조항은 정확히 명시
+- 전문 용어 사용 시 약어 설명 포함
+"""
+
+# 프롬프트 템플릿은 한 번만 만들어 두고 호출마다 format_messages만 실행
+_ANALYZE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", ANALYZE_SYSTEM_PROMPT),
+    ("human", "=== 분석 대상 문서 ===\n{content}")
+])
+_RISK_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", RISK_SYSTEM_PROMPT),
+    ("human", "=== 평가 대상 ===\n문서 유형: {doc_type}\n1차 분석 결과 (JSON): {analysis}")
+])
+_REPORT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", REPORT_SYSTEM_PROMPT),
+    ("human", "=== 분석 데이터 (JSON) ===\n문서 유형: {doc_type}\n1차 분석: {primary_analysis}\n위험도 평가: {risk_assessment}\n웹 검색 결과: {web_search}\n준수 점수: {compliance_score}")
+])
+
+# 시스템 프롬프트 내용까지 반영한 캐시 버전 (프롬프트를 고치면 이전 응답을 재사용하지 않음)
+_CACHE_VERSION = "{}-{}".format(
+    PROMPT_CACHE_VERSION,
+    _key_hash(ANALYZE_SYSTEM_PROMPT + RISK_SYSTEM_PROMPT + REPORT_SYSTEM_PROMPT)[:8]
+)
 
 
 class MultiAgentAnalysisSystem:
@@ -33,373 +639,140 @@ class MultiAgentAnalysisSystem:
     def __init__(self, openai_api_key: str, tavily_api_key: str = None):
         self.openai_api_key = openai_api_key
         self.tavily_api_key = tavily_api_key
+        # 검색할 때마다 클라이언트를 만들지 않고 하나를 재사용
+        self.tavily_client = (
+            TavilyClient(api_key=tavily_api_key) if tavily_api_key and TavilyClient else None
+        )
         self.llm = ChatOpenAI(
             openai_api_key=openai_api_key,
             model_name="gpt-4o",
-            temperature=0
+            temperature=0,
+            # 재시도는 _llm_retry가 담당 (클라이언트 자체 재시도와 겹치면 시도 횟수가 곱절로 늘어남)
+            max_retries=0
         )
+        # JSON을 돌려받는 노드는 구조화 출력으로 호출해 스키마에 맞는 결과를 보장
+        self.llm_analyze = self.llm.with_structured_output(ClassifiedAnalysis)
+        self.llm_risk = self.llm.with_structured_output(RiskAssessment)
+        self.embeddings = OpenAIEmbeddings(
+            openai_api_key=openai_api_key,
+            model=EMBEDDING_MODEL_NAME
+        )
+        self.semantic_cache = SemanticCache(version=_CACHE_VERSION)
         self.workflow = self._create_workflow()
+        # 공유하는 비동기 HTTP 클라이언트가 처음 사용한 이벤트 루프에 묶이므로,
+        # 분석마다 asyncio.run으로 새 루프를 만들지 않고 이 상시 루프에서만 실행
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="multi-agent-loop", daemon=True).start()
     
     def _create_workflow(self) -> StateGraph:
         """워크플로우 생성"""
         workflow = StateGraph(AnalysisState)
         
         # 노드 추가
-        workflow.add_node("document_classifier", self._classify_document)
-        workflow.add_node("primary_analyzer", self._primary_analysis)
+        workflow.add_node("document_analyzer", self._classify_and_analyze)
         workflow.add_node("risk_assessor", self._assess_risk)
         workflow.add_node("web_searcher", self._search_web_info)
         workflow.add_node("compliance_scorer", self._calculate_compliance_score)
         workflow.add_node("report_generator", self._generate_final_report)
         
         # 워크플로우 정의
-        workflow.set_entry_point("document_classifier")
-        workflow.add_edge("document_classifier", "primary_analyzer")
-        workflow.add_edge("primary_analyzer", "risk_assessor")
-        workflow.add_edge("risk_assessor", "web_searcher")
-        workflow.add_edge("web_searcher", "compliance_scorer")
+        workflow.set_entry_point("document_analyzer")
+        # 문서 분류와 1차 분석은 한 번의 LLM 호출로 처리하고, 웹 검색은 위험도 평가와 동시에 실행합니다.
+        # 점수 계산은 위험도 평가와 웹 검색이 모두 끝난 뒤에 진행합니다.
+        # 분류·1차 분석이 실패하면 남은 에이전트를 건너뛰고 바로 실패 보고서로 이동합니다.
+        workflow.add_conditional_edges(
+            "document_analyzer", self._route_after_analysis,
+            ["risk_assessor", "web_searcher", "report_generator"]
+        )
+        workflow.add_edge(["risk_assessor", "web_searcher"], "compliance_scorer")
         workflow.add_edge("compliance_scorer", "report_generator")
         workflow.add_edge("report_generator", END)
         
         return workflow.compile()
     
-    def _classify_document(self, state: AnalysisState) -> AnalysisState:
-        """문서 분류 에이전트 - 고도화된 프롬프트"""
-        try:
-            prompt = ChatPromptTemplate.from_template("""
-            당신은 금융 규제 전문가로서 20년간 금융감독원에서 근무한 경험이 있습니다.
-            다음 문서를 정확히 분류하고, 분류 근거를 함께 제시해주세요.
-            
-            === 분석 대상 문서 ===
-            {content}
-            
-            === 문서 분류 기준 ===
-            1. 금융상품설명서
-               - 투자위험, 수익구조, 상품특성 설명 포함
-               - 금융투자업법, 자본시장법 관련 용어 사용
-               - 투자자 보호, 투자권유, 적합성 원칙 언급
-            
-            2. 서비스약관
-               - 서비스 이용조건, 권리의무, 책임한계 규정
-               - 약관의 변경, 해지, 분쟁해결 절차 포함
-               - 소비자보호법, 전자상거래법 관련 내용
-            
-            3. 개인정보처리방침
-               - 개인정보 수집/이용/제공/파기 절차
-               - 개인정보보호법, 신용정보법 준수사항
-               - 정보주체 권리, 동의철회, 손해배상 명시
-            
-            4. 보안정책
-               - 정보보안 관리체계, 접근통제, 암호화
-               - 보안사고 대응, 취약점 관리, 보안교육
-               - 정보보호관리체계(ISMS), ISO27001 관련
-            
-            5. 시스템구성도
-               - 시스템 아키텍처, 네트워크 구성
-               - 서버/DB 구조, 보안장비 배치
-               - 기술적 보안조치, 인프라 설명
-            
-            6. 기타
-               - 위 카테고리에 해당하지 않는 문서
-            
-            === 출력 형식 ===
-            분류번호: [1-6]
-            분류명: [해당 문서 유형]
-            신뢰도: [1-10점]
-            근거: [분류한 주요 근거 3가지]
-            
-            반드시 이 형식으로만 답변하세요.
-            """)
-            
-            response = self.llm.invoke(
-                prompt.format_messages(content=state["input_content"][:2000])
-            )
-            
-            # 고도화된 응답 파싱
-            response_text = response.content.strip()
-            lines = response_text.split('\n')
-            
-            doc_type = "기타"
-            confidence = 5
-            
-            for line in lines:
-                if "분류번호:" in line:
-                    try:
-                        num = line.split(":")[1].strip()
-                        doc_types = {
-                            "1": "금융상품설명서",
-                            "2": "서비스약관", 
-                            "3": "개인정보처리방침",
-                            "4": "보안정책",
-                            "5": "시스템구성도",
-                            "6": "기타"
-                        }
-                        doc_type = doc_types.get(num, "기타")
-                    except:
-                        pass
-                elif "신뢰도:" in line:
-                    try:
-                        confidence = int(line.split(":")[1].strip().split("점")[0])
-                    except:
-                        pass
-            
-            state["document_type"] = doc_type
-            state["current_step"] = f"문서 분류 완료 (신뢰도: {confidence}/10)"
-            
-        except Exception as e:
-            state["error_message"] = f"문서 분류 오류: {str(e)}"
-            state["document_type"] = "기타"
-        
-        return state
+    def _route_after_analysis(self, state: AnalysisState):
+        """분류·1차 분석 결과가 없으면 실패 보고서로, 있으면 위험도 평가와 웹 검색으로 분기"""
+        if not state["primary_analysis"]:
+            return "report_generator"
+        return ["risk_assessor", "web_searcher"]
     
-    def _primary_analysis(self, state: AnalysisState) -> AnalysisState:
-        """1차 분석 에이전트 - 전문가 수준 분석"""
+    async def _classify_and_analyze(self, state: AnalysisState) -> Dict[str, Any]:
+        """문서 분류 + 1차 분석 에이전트 - 같은 문서를 두 번 읽지 않도록 한 번의 호출로 처리"""
+        # analyze_documents에서 일괄 분석을 마친 문서는 다시 호출하지 않음
+        if state["primary_analysis"]:
+            return {"current_step": "문서 분류·1차 분석 완료 (일괄 분석 결과 사용)"}
         try:
-            prompt = ChatPromptTemplate.from_template("""
-            당신은 금융감독원 검사국에서 15년간 근무한 시니어 금융검사관입니다.
-            {doc_type} 문서에 대해 금융 규제 관점에서 심층 분석을 수행하세요.
-            
-            === 분석 대상 문서 ===
-            {content}
-            
-            === 분석 가이드라인 ===
-            
-            1. 주요내용 분석 시:
-               - 문서의 핵심 목적과 적용범위 명확히 파악
-               - 이해관계자(고객, 기업, 규제기관) 관점에서 중요도 평가
-               - 비즈니스 임팩트와 규제 리스크 동시 고려
-            
-            2. 규제관련사항 식별 시:
-               - 금융위원회 고시, 금감원 규정 위반 가능성
-               - 금융소비자보호법, 개인정보보호법, 신용정보법 준수사항
-               - 전자금융거래법, 자본시장법 관련 의무사항
-               - 국제 규제(바젤III, GDPR 등) 영향도
-            
-            3. 보안요소 검토 시:
-               - 정보보호관리체계(ISMS-P) 인증 요구사항
-               - 암호화, 접근통제, 로그관리 등 기술적 조치
-               - 물리적/관리적 보안조치 적정성
-               - 보안사고 대응체계 구축 현황
-            
-            4. 개인정보 처리 검토 시:
-               - 수집/이용/제공/파기 각 단계별 적법성
-               - 동의 획득 절차와 고지사항 충족성
-               - 개인정보 영향평가 대상 여부 판단
-               - 정보주체 권리 보장 메커니즘
-            
-            5. 위험요소 평가 시:
-               - 규제 위반으로 인한 제재 위험 (과태료, 영업정지 등)
-               - 평판 리스크와 고객 신뢰도 손상 가능성
-               - 시스템 장애나 보안사고 발생 시 파급효과
-               - 경쟁사 대비 컴플라이언스 수준 격차
-            
-            === 출력 형식 (JSON) ===
-            {{
-                "주요내용": {{
-                    "목적": "문서의 핵심 목적",
-                    "적용범위": "적용 대상과 범위",
-                    "핵심조항": ["중요한 조항 3-5개"]
-                }},
-                "규제관련사항": {{
-                    "준수법령": ["관련 법령명"],
-                    "규제요구사항": ["구체적 요구사항"],
-                    "컴플라이언스이슈": ["발견된 이슈"],
-                    "개선필요사항": ["개선이 필요한 부분"]
-                }},
-                "보안요소": {{
-                    "기술적조치": ["암호화, 접근통제 등"],
-                    "관리적조치": ["정책, 절차, 교육 등"],
-                    "물리적조치": ["시설보안, 출입통제 등"],
-                    "보안수준평가": "상/중/하"
-                }},
-                "개인정보": {{
-                    "처리현황": ["수집/이용/제공/파기 현황"],
-                    "법적근거": ["처리 법적 근거"],
-                    "권리보장": ["정보주체 권리 보장 현황"],
-                    "위험도": "상/중/하"
-                }},
-                "위험요소": {{
-                    "규제위험": ["규제 위반 가능성"],
-                    "운영위험": ["시스템/프로세스 리스크"],
-                    "평판위험": ["이미지 손상 요소"],
-                    "우선순위": ["즉시해결/단기개선/중장기과제"]
-                }}
-            }}
-            
-            반드시 JSON 형식으로만 답변하고, 각 항목은 구체적이고 실무적으로 작성하세요.
-            """)
-            
-            response = self.llm.invoke(
-                prompt.format_messages(
-                    doc_type=state["document_type"],
-                    content=state["input_content"][:2000]
-                )
+            content = self._agent_input(state, "document_analyzer")
+            response_text = await self._cached_invoke(
+                "document_analyzer", content, self._analyze_messages(content),
+                llm=self.llm_analyze
             )
-            
-            try:
-                analysis_result = json.loads(response.content)
-            except:
-                # JSON 파싱 실패 시 기본 구조 제공
-                analysis_result = {
-                    "주요내용": response.content[:500],
-                    "규제관련사항": ["분석 중 오류 발생"],
-                    "보안요소": ["분석 중 오류 발생"],
-                    "개인정보": ["분석 중 오류 발생"],
-                    "위험요소": ["분석 중 오류 발생"]
-                }
-            
-            state["primary_analysis"] = analysis_result
-            state["current_step"] = "1차 분석 완료"
+            return self._analysis_update(ClassifiedAnalysis.model_validate_json(response_text))
             
         except Exception as e:
-            state["error_message"] = f"1차 분석 오류: {str(e)}"
-            state["primary_analysis"] = {"오류": "분석 실패"}
-        
-        return state
+            return {"error_message": f"문서 분류·1차 분석 오류: {str(e)}"}
     
-    def _assess_risk(self, state: AnalysisState) -> AnalysisState:
+    def _analyze_messages(self, content: str):
+        """문서 분류·1차 분석 프롬프트 메시지 생성"""
+        return _ANALYZE_PROMPT.format_messages(content=content)
+    
+    def _parse_classification(self, result: ClassifiedAnalysis):
+        """구조화된 분석 결과에서 (문서 유형, 신뢰도) 추출"""
+        return _DOC_TYPES.get(result.category, "기타"), result.confidence
+    
+    def _analysis_update(self, result: ClassifiedAnalysis) -> Dict[str, Any]:
+        """분류·1차 분석 결과를 상태 갱신 값으로 변환"""
+        doc_type, confidence = self._parse_classification(result)
+        analysis_result = result.analysis.model_dump(by_alias=True)
+        return {
+            "document_type": doc_type,
+            "primary_analysis": analysis_result,
+            # 결과 화면에서 매번 세지 않도록 발견사항 수를 미리 계산
+            "finding_counts": {
+                "risk": len(analysis_result.get("위험요소", ())),
+                "reg": len(analysis_result.get("규제관련사항", ()))
+            },
+            "current_step": f"문서 분류·1차 분석 완료 (신뢰도: {confidence}/10)"
+        }
+    
+    async def _assess_risk(self, state: AnalysisState) -> Dict[str, Any]:
         """위험도 평가 에이전트 - 정량적 리스크 모델링"""
         try:
-            prompt = ChatPromptTemplate.from_template("""
-            당신은 Big4 회계법인의 리스크 어드바이저리 파트너로서 10년간 금융회사 리스크 관리를 전담했습니다.
-            다음 분석 결과를 바탕으로 정량적 위험도 평가를 실시하세요.
-            
-            === 평가 대상 ===
-            문서 유형: {doc_type}
-            1차 분석 결과: {analysis}
-            
-            === 위험도 평가 방법론 ===
-            
-            각 영역별로 다음 기준에 따라 1-10점으로 평가하세요:
-            - 1-2점: 모범사례 수준 (업계 상위 10%)
-            - 3-4점: 우수 수준 (규제 요구사항 완벽 충족)
-            - 5-6점: 적정 수준 (기본 요구사항 충족)
-            - 7-8점: 미흡 수준 (일부 개선 필요)
-            - 9-10점: 위험 수준 (즉시 조치 필요)
-            
-            === 평가 영역별 세부 기준 ===
-            
-            1. 개인정보보호 (GDPR, 개인정보보호법 기준)
-               - 수집/이용 목적의 명확성과 최소수집 원칙 준수
-               - 동의 획득 절차의 적법성 (명시적/선택적 동의)
-               - 개인정보 처리위탁 관리 체계
-               - 정보주체 권리 행사 절차 구비
-               - 개인정보 유출 시 대응체계
-               평가항목: 법적 근거, 동의 체계, 처리 위탁, 권리 보장, 사고 대응
-            
-            2. 데이터보안 (ISMS-P, ISO27001 기준)
-               - 암호화 적용 범위와 강도 (전송/저장)
-               - 데이터 분류 체계와 보호 조치
-               - 백업 및 복구 체계
-               - 데이터 생명주기 관리
-               - 클라우드/외부 보관 시 보안 조치
-               평가항목: 암호화, 분류 체계, 백업/복구, 생명주기, 외부 보관
-            
-            3. 접근제어 (최소권한 원칙)
-               - 사용자 인증 체계 (다중 인증 포함)
-               - 권한 부여 및 관리 절차
-               - 관리자 계정 보안 조치
-               - 접근 로그 모니터링 체계
-               - 권한 정기 검토 프로세스
-               평가항목: 인증 체계, 권한 관리, 관리자 보안, 로그 관리, 정기 검토
-            
-            4. 규제준수 (금융 규제 전반)
-               - 관련 법령 식별 완성도
-               - 규제 요구사항 이행 수준
-               - 내부 통제 체계 구축
-               - 컴플라이언스 모니터링 체계
-               - 규제 변화 대응 체계
-               평가항목: 법령 준수, 요구사항 이행, 내부 통제, 모니터링, 변화 대응
-            
-            === 출력 형식 (JSON) ===
-            {{
-                "개인정보보호": {{
-                    "점수": [1-10],
-                    "등급": "모범/우수/적정/미흡/위험",
-                    "사유": "구체적 평가 근거 (법령 조항 포함)",
-                    "주요이슈": ["발견된 주요 이슈 2-3개"],
-                    "개선방안": ["즉시 개선 방안 2-3개"]
-                }},
-                "데이터보안": {{
-                    "점수": [1-10],
-                    "등급": "모범/우수/적정/미흡/위험",
-                    "사유": "구체적 평가 근거 (보안 표준 포함)",
-                    "주요이슈": ["발견된 주요 이슈 2-3개"],
-                    "개선방안": ["즉시 개선 방안 2-3개"]
-                }},
-                "접근제어": {{
-                    "점수": [1-10],
-                    "등급": "모범/우수/적정/미흡/위험",
-                    "사유": "구체적 평가 근거",
-                    "주요이슈": ["발견된 주요 이슈 2-3개"],
-                    "개선방안": ["즉시 개선 방안 2-3개"]
-                }},
-                "규제준수": {{
-                    "점수": [1-10],
-                    "등급": "모범/우수/적정/미흡/위험",
-                    "사유": "구체적 평가 근거 (관련 법령 명시)",
-                    "주요이슈": ["발견된 주요 이슈 2-3개"],
-                    "개선방안": ["즉시 개선 방안 2-3개"]
-                }},
-                "전체위험도": {{
-                    "점수": [1-10],
-                    "등급": "모범/우수/적정/미흡/위험",
-                    "종합의견": "전체적인 위험 수준에 대한 종합 의견",
-                    "우선개선과제": ["가장 시급한 개선 과제 3개"],
-                    "예상제재": ["위험도별 예상 제재 수준"]
-                }}
-            }}
-            
-            반드시 JSON 형식으로 답변하고, 모든 평가는 구체적 근거와 함께 제시하세요.
-            """)
-            
-            response = self.llm.invoke(
-                prompt.format_messages(
-                    doc_type=state["document_type"],
-                    analysis=str(state["primary_analysis"])
-                )
+            analysis = _compact_json(state["primary_analysis"])
+            response_text = await self._cached_invoke(
+                "risk_assessor",
+                f"{state['document_type']}|{analysis}",
+                _RISK_PROMPT.format_messages(doc_type=state["document_type"], analysis=analysis),
+                llm=self.llm_risk
             )
+            risk_result = orjson.loads(response_text)
             
-            try:
-                risk_result = json.loads(response.content)
-            except:
-                # 기본 위험도 설정
-                risk_result = {
-                    "개인정보보호": {"점수": 5, "사유": "분석 중 오류"},
-                    "데이터보안": {"점수": 5, "사유": "분석 중 오류"},
-                    "접근제어": {"점수": 5, "사유": "분석 중 오류"},
-                    "규제준수": {"점수": 5, "사유": "분석 중 오류"},
-                    "전체위험도": {"점수": 5, "등급": "보통"}
-                }
-            
-            state["risk_assessment"] = risk_result
-            state["current_step"] = "위험도 평가 완료"
+            return {
+                "risk_assessment": risk_result,
+                "current_step": "위험도 평가 완료"
+            }
             
         except Exception as e:
-            state["error_message"] = f"위험도 평가 오류: {str(e)}"
-            state["risk_assessment"] = {"오류": "평가 실패"}
-        
-        return state
+            return {"error_message": f"위험도 평가 오류: {str(e)}"}
     
-    def _search_web_info(self, state: AnalysisState) -> AnalysisState:
-        """웹 검색 에이전트"""
+    async def _search_web_info(self, state: AnalysisState) -> Dict[str, Any]:
+        """웹 검색 에이전트 (Tavily 클라이언트가 동기식이라 별도 스레드에서 호출해 이벤트 루프를 막지 않음)"""
         try:
-            if not self.tavily_api_key:
-                state["web_search_results"] = {
-                    "결과": "웹 검색 기능이 비활성화됨",
-                    "관련규제": ["Tavily API 키 필요"]
+            if not self.tavily_client:
+                return {
+                    "web_search_results": {
+                        "결과": "웹 검색 기능이 비활성화됨",
+                        "관련규제": ["Tavily API 키 필요"]
+                    },
+                    "current_step": "웹 검색 건너뜀"
                 }
-                state["current_step"] = "웹 검색 건너뜀"
-                return state
-            
-            from tavily import TavilyClient
-            tavily = TavilyClient(api_key=self.tavily_api_key)
             
             # 검색 쿼리 생성
             doc_type = state["document_type"]
             search_query = f"금융 규제 {doc_type} 가이드라인 2024 금융위원회 금융보안원"
             
-            search_result = tavily.search(
+            search_result = await asyncio.to_thread(
+                self.tavily_client.search,
                 query=search_query,
                 search_depth="basic",
                 max_results=3,
@@ -419,241 +792,324 @@ class MultiAgentAnalysisSystem:
                     "내용": result.get("content", "")[:200]
                 })
             
-            state["web_search_results"] = web_info
-            state["current_step"] = "웹 검색 완료"
+            return {
+                "web_search_results": web_info,
+                "current_step": "웹 검색 완료"
+            }
             
         except Exception as e:
-            state["error_message"] = f"웹 검색 오류: {str(e)}"
-            state["web_search_results"] = {"오류": "검색 실패"}
-        
-        return state
+            # 실패 결과를 데이터처럼 넘기지 않고 오류만 기록 (보고서에는 빈 검색 결과로 전달됨)
+            return {"error_message": f"웹 검색 오류: {str(e)}"}
     
-    def _calculate_compliance_score(self, state: AnalysisState) -> AnalysisState:
+    def _calculate_compliance_score(self, state: AnalysisState) -> Dict[str, Any]:
         """규제 준수 점수 계산 에이전트"""
         try:
             # 위험도 점수를 준수 점수로 변환 (위험도가 낮을수록 준수도가 높음)
             risk_scores = state.get("risk_assessment", {})
-            
-            compliance_scores = {}
-            total_score = 0
-            count = 0
-            
-            for category, data in risk_scores.items():
-                if category != "전체위험도" and isinstance(data, dict) and "점수" in data:
-                    # 위험도 점수(1-10)를 준수 점수(1-100)로 변환
-                    risk_score = data["점수"]
-                    compliance_score = max(10, 110 - (risk_score * 10))
-                    compliance_scores[category] = {
-                        "점수": compliance_score,
-                        "등급": self._get_grade(compliance_score),
-                        "사유": data.get("사유", "")
-                    }
-                    total_score += compliance_score
-                    count += 1
+            categories = [
+                category for category, data in risk_scores.items()
+                if category != "전체위험도" and isinstance(data, dict) and "점수" in data
+            ]
+            
+            # 위험도 점수(1-10)를 준수 점수(1-100)로 한 번에 변환
+            risks = np.fromiter((risk_scores[c]["점수"] for c in categories), dtype=np.int16, count=len(categories))
+            compliance = np.maximum(10, 110 - risks * 10)
+            grades = _grade_vec(compliance)
+            
+            compliance_scores = {
+                category: {
+                    "점수": int(score),
+                    "등급": str(grade),
+                    "사유": risk_scores[category].get("사유", "")
+                }
+                for category, score, grade in zip(categories, compliance, grades)
+            }
             
             # 전체 점수 계산
-            if count > 0:
-                overall_score = total_score / count
+            if compliance.size > 0:
+                overall_score = float(compliance.mean())
                 compliance_scores["전체점수"] = {
                     "점수": round(overall_score, 1),
                     "등급": self._get_grade(overall_score),
                     "백분율": f"{round(overall_score)}%"
                 }
             
-            state["compliance_score"] = compliance_scores
-            state["current_step"] = "준수 점수 계산 완료"
+            return {
+                "compliance_score": compliance_scores,
+                "current_step": "준수 점수 계산 완료"
+            }
             
         except Exception as e:
-            state["error_message"] = f"점수 계산 오류: {str(e)}"
-            state["compliance_score"] = {"오류": "계산 실패"}
-        
-        return state
+            return {"error_message": f"점수 계산 오류: {str(e)}"}
     
     def _get_grade(self, score: float) -> str:
         """점수를 등급으로 변환"""
-        if score >= 90:
-            return "우수"
-        elif score >= 80:
-            return "양호"
-        elif score >= 70:
-            return "보통"
-        elif score >= 60:
-            return "미흡"
-        else:
-            return "부족"
+        return str(_grade_vec(score))
     
-    def _generate_final_report(self, state: AnalysisState) -> AnalysisState:
-        """최종 보고서 생성 에이전트 - 금융감독 전문 리포트"""
+    async def _generate_final_report(self, state: AnalysisState, config: RunnableConfig) -> Dict[str, Any]:
+        """최종 보고서 생성 에이전트 - 금융감독 전문 리포트
+        
+        config의 configurable["report_callback"]이 있으면 보고서를 생성되는 대로 전달합니다.
+        """
+        # 앞 단계가 실패했으면 불완전한 결과로 LLM을 호출하지 않고 실패 보고서만 작성
+        if not state["primary_analysis"] or not state["risk_assessment"]:
+            return {
+                "final_report": f"## ⚠️ 분석 실패\n\n분석 중 오류가 발생해 보고서를 생성하지 못했습니다.\n\n{state['error_message']}"
+            }
         try:
-            prompt = ChatPromptTemplate.from_template("""
-            당신은 금융감독원 전자검사팀에서 10년간 근무한 수석 검사관입니다.
-            다음 분석 결과를 바탕으로 임원진과 이사회에 제출할 수준의 전문적인 종합 보고서를 작성하세요.
-            
-            === 분석 데이터 ===
-            문서 유형: {doc_type}
-            1차 분석: {primary_analysis}
-            위험도 평가: {risk_assessment}
-            웹 검색 결과: {web_search}
-            준수 점수: {compliance_score}
-            
-            === 보고서 작성 지침 ===
-            
-            1. 임원진 관점 고려사항:
-               - 규제 위반 시 발생 가능한 과태료 및 제재 조치
-               - 기업 이미지와 고객 신뢰도에 미치는 영향
-               - 경쟁사 대비 컴플라이언스 수준과 차별화 요소
-               - 투자 우선순위와 예산 배정을 위한 구체적 근거
-            
-            2. 이사회 보고 수준:
-               - 정량적 지표 중심의 객관적 평가
-               - 법적 리스크의 재무적 영향 분석
-               - 단계별 개선 로드맵과 예상 소요 기간
-               - 업계 모범사례 및 벤치마킹 결과
-            
-            3. 실무진 액션플랜:
-               - 즉시 조치 가능한 단기 개선과제 (1-3개월)
-               - 시스템 개선이 필요한 중기 과제 (3-12개월)
-               - 정책/프로세스 고도화 장기 과제 (1-2년)
-               - 각 과제별 담당 부서와 예상 비용
-            
-            === 보고서 구조 (Executive Summary 스타일) ===
-            
-            ## 🏛️ 규제 준수 종합 분석 보고서
-            
-            ### 📋 Executive Summary
-            **문서명**: {doc_type} 규제 준수 분석
-            **분석일시**: [현재 시간]
-            **전체 준수 점수**: [점수]/100점 ([등급])
-            **종합 의견**: [전체적인 준수 수준에 대한 한 줄 요약]
-            
-            ### 🎯 주요 발견사항 (Key Findings)
-            **1. 핵심 준수 이슈**
-            - [가장 중요한 컴플라이언스 이슈 2-3개]
-            
-            **2. 규제 위험도 평가**
-            - 개인정보보호: [점수]점 ([등급]) - [주요 이슈]
-            - 데이터보안: [점수]점 ([등급]) - [주요 이슈]
-            - 접근제어: [점수]점 ([등급]) - [주요 이슈]
-            - 규제준수: [점수]점 ([등급]) - [주요 이슈]
-            
-            **3. 규제 환경 변화**
-            - [최신 규제 동향과 우리 기업에 미치는 영향]
-            
-            ### ⚠️ 위험 요소 및 영향 분석 (Risk Assessment)
-            **1. 즉시 조치 필요 (Critical)**
-            - [9-10점 위험 요소들] → 예상 제재: [구체적 제재 수준]
-            
-            **2. 단기 개선 필요 (High)**
-            - [7-8점 위험 요소들] → 예상 영향: [비즈니스 영향도]
-            
-            **3. 중장기 관리 필요 (Medium)**
-            - [5-6점 위험 요소들] → 관리 방향: [개선 방향성]
-            
-            ### 📋 Action Plan (실행 계획)
-            **1. 즉시 실행 (1-30일)**
-            - [ ] [구체적 액션 아이템 1] - 담당: [부서] - 비용: [예상 비용]
-            - [ ] [구체적 액션 아이템 2] - 담당: [부서] - 비용: [예상 비용]
-            
-            **2. 단기 실행 (1-6개월)**
-            - [ ] [구체적 액션 아이템 1] - 담당: [부서] - 비용: [예상 비용]
-            - [ ] [구체적 액션 아이템 2] - 담당: [부서] - 비용: [예상 비용]
-            
-            **3. 중장기 실행 (6-24개월)**
-            - [ ] [구체적 액션 아이템 1] - 담당: [부서] - 비용: [예상 비용]
-            - [ ] [구체적 액션 아이템 2] - 담당: [부서] - 비용: [예상 비용]
-            
-            ### 💰 투자 우선순위 및 예산 가이드
-            **1. 필수 투자 (ROI: 즉시)**
-            - [규제 위반 방지를 위한 필수 투자 항목들]
-            
-            **2. 권장 투자 (ROI: 6-12개월)**
-            - [경쟁 우위 확보를 위한 권장 투자 항목들]
-            
-            **3. 선택 투자 (ROI: 12-24개월)**
-            - [미래 대비를 위한 선택적 투자 항목들]
-            
-            ### 🔄 지속적 모니터링 체계
-            **1. 정기 점검 주기**
-            - 월간: [월간 점검 항목]
-            - 분기: [분기 점검 항목]
-            - 연간: [연간 점검 항목]
-            
-            **2. KPI 및 성과지표**
-            - [측정 가능한 성과지표 3-5개]
-            
-            ### 📚 참고 규제 및 가이드라인
-            - [관련 법령 및 규정 목록]
-            - [업계 모범사례 및 벤치마크]
-            - [최신 규제 동향 정보]
-            
-            ---
-            **보고서 작성**: 금융감독 AI 시스템
-            **검토 필요**: 컴플라이언스팀, 법무팀, 정보보호팀
-            **승인 라인**: 부서장 → 임원진 → 이사회
-            
-            === 작성 시 주의사항 ===
-            - 모든 위험도 점수는 구체적 수치로 명시
-            - 예상 제재나 비용은 현실적 범위로 제시
-            - 액션 아이템은 실행 가능한 수준으로 구체화
-            - 담당 부서는 일반적인 조직 구조 기준으로 제시
-            - 법령명과 조항은 정확히 명시
-            - 전문 용어 사용 시 약어 설명 포함
-            """)
-            
-            response = self.llm.invoke(
-                prompt.format_messages(
-                    doc_type=state["document_type"],
-                    primary_analysis=str(state["primary_analysis"]),
-                    risk_assessment=str(state["risk_assessment"]),
-                    web_search=str(state["web_search_results"]),
-                    compliance_score=str(state["compliance_score"])
-                )
+            report_inputs = dict(
+                doc_type=state["document_type"],
+                primary_analysis=_compact_json(state["primary_analysis"]),
+                risk_assessment=_compact_json(state["risk_assessment"]),
+                web_search=_compact_json(state["web_search_results"]),
+                compliance_score=_compact_json(state["compliance_score"])
+            )
+            response_text = await self._cached_invoke(
+                "report_generator",
+                "|".join(report_inputs.values()),
+                _REPORT_PROMPT.format_messages(**report_inputs),
+                on_token=config.get("configurable", {}).get("report_callback")
             )
             
-            # 현재 시간과 동적 데이터 치환
-            current_time = datetime.now().strftime("%Y년 %m월 %d일 %H:%M:%S")
-            final_report = response.content.replace("[현재 시간]", current_time)
-            
-            # 전체 점수 정보 추가
+            # 현재 시간과 전체 점수 정보를 한 번의 치환으로 채움
+            subs = {"현재 시간": datetime.now().strftime("%Y년 %m월 %d일 %H:%M:%S")}
             if "compliance_score" in state and "전체점수" in state["compliance_score"]:
                 total_score_data = state["compliance_score"]["전체점수"]
-                score = total_score_data.get("점수", "미측정")
-                grade = total_score_data.get("등급", "미평가")
-                final_report = final_report.replace("[점수]/100점 ([등급])", f"{score}/100점 ({grade})")
-                final_report = final_report.replace("[점수]", str(score))
-                final_report = final_report.replace("[등급]", grade)
+                subs["점수"] = str(total_score_data.get("점수", "미측정"))
+                subs["등급"] = total_score_data.get("등급", "미평가")
+            final_report = _PLACEHOLDER_RE.sub(lambda m: subs.get(m.group(1), m.group(0)), response_text)
             
-            state["final_report"] = final_report
-            state["current_step"] = "전문 보고서 생성 완료"
+            return {
+                "final_report": final_report,
+                "current_step": "전문 보고서 생성 완료"
+            }
             
         except Exception as e:
-            state["error_message"] = f"보고서 생성 오류: {str(e)}"
-            state["final_report"] = f"## ⚠️ 보고서 생성 오류\n\n보고서 생성 중 오류가 발생했습니다: {str(e)}\n\n기본 분석 결과를 확인해주세요."
+            return {
+                "error_message": f"{_REPORT_ERROR_PREFIX}: {str(e)}",
+                "final_report": f"## ⚠️ 보고서 생성 오류\n\n보고서 생성 중 오류가 발생했습니다: {str(e)}\n\n기본 분석 결과를 확인해주세요."
+            }
+    
+    async def _cached_invoke(self, node: str, key_text: str, messages, llm=None, on_token=None) -> str:
+        """비슷한 입력에 대한 응답이 시맨틱 캐시에 있으면 LLM을 호출하지 않고 그대로 반환
         
-        return state
+        EXACT_CACHE_NODES에 속한 노드는 임베딩 없이 입력이 완전히 같은 응답만 재사용합니다.
+        on_token이 주어지면 응답을 스트리밍으로 받아 조각마다 on_token(text)을 호출합니다.
+        """
+        vector = None
+        if node not in EXACT_CACHE_NODES:
+            vector = np.asarray(await self.embeddings.aembed_query(key_text), dtype="float32")
+            vector /= np.linalg.norm(vector)
+        cached = self.semantic_cache.lookup(node, key_text, vector)
+        if cached is not None:
+            if on_token:
+                on_token(cached)
+            return cached
+        extra_body = {"prompt_cache_key": f"compliance_{node}_{PROMPT_CACHE_VERSION}"}
+        if on_token:
+            text = await self._astream_with_retry(llm or self.llm, messages, on_token, extra_body=extra_body)
+            self.semantic_cache.add(node, key_text, text, vector)
+            return text
+        response = await self._ainvoke_with_retry(llm or self.llm, messages, extra_body=extra_body)
+        # 구조화 출력은 Pydantic 객체로 오므로 캐시와 노드에서 같은 JSON 문자열로 다룸
+        # (AIMessage도 Pydantic 모델이므로 일반 응답인지 먼저 확인)
+        text = response.content if isinstance(response, AIMessage) else response.model_dump_json(by_alias=True)
+        self.semantic_cache.add(node, key_text, text, vector)
+        return text
+    
+    @_llm_retry
+    async def _ainvoke_with_retry(self, llm, messages, **kwargs):
+        """요청 한도 초과·연결 오류 등 일시적인 오류는 재시도"""
+        return await llm.ainvoke(messages, **kwargs)
+    
+    @_llm_retry
+    async def _astream_with_retry(self, llm, messages, on_token, **kwargs) -> str:
+        """스트리밍 호출 (조각을 내보내기 전에 난 일시적인 오류만 재시도해 같은 조각이 두 번 나가지 않게 함)"""
+        parts = []
+        try:
+            async for chunk in llm.astream(messages, **kwargs):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    on_token(chunk.content)
+        except _RETRYABLE_ERRORS as e:
+            if parts:
+                raise RuntimeError(f"스트리밍 중 연결이 끊어졌습니다: {e}") from e
+            raise
+        return "".join(parts)
     
-    def analyze_document(self, content: str) -> AnalysisState:
-        """문서 분석 실행"""
-        initial_state = AnalysisState(
+    def _agent_input(self, state: AnalysisState, node: str) -> str:
+        """에이전트에 넘길 문서 내용 (관련 조각이 선별되어 있으면 그것을 사용)"""
+        section = state.get("input_sections", {}).get(node)
+        return _truncate_tokens(section or state["input_content"])
+    
+    @staticmethod
+    def select_input_sections(vectorstore, k: int = 4) -> Dict[str, str]:
+        """에이전트별 작업과 관련된 문서 조각만 골라 입력으로 구성"""
+        return {
+            node: "\n\n".join(doc.page_content for doc in vectorstore.similarity_search(hint, k=k))
+            for node, hint in AGENT_TASK_HINTS.items()
+        }
+    
+    def _initial_state(self, content: str, input_sections: Dict[str, str] = None,
+                       document_type: str = "") -> AnalysisState:
+        """초기 분석 상태 생성"""
+        return AnalysisState(
             input_content=content,
-            document_type="",
+            input_sections=input_sections or {},
+            document_type=document_type,
             primary_analysis={},
+            finding_counts={"risk": 0, "reg": 0},
             risk_assessment={},
             web_search_results={},
             compliance_score={},
             final_report="",
+            # 화면 재실행 때마다 바뀌지 않도록 분석 일시를 결과에 고정
+            analyzed_at=datetime.now().strftime("%Y-%m-%d %H:%M"),
             current_step="시작",
             error_message=""
         )
+    
+    def run_async(self, coro):
+        """코루틴을 시스템의 상시 이벤트 루프에서 실행하고 결과를 기다림"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+    
+    def analyze_document(self, content: str, on_step=None,
+                         input_sections: Dict[str, str] = None, report_callback=None,
+                         thread_id: str = None, regenerate_report: bool = False) -> AnalysisState:
+        """문서 분석 실행 (동기, analyze_document_async를 상시 이벤트 루프에서 실행)
+        
+        on_step과 report_callback은 루프 스레드가 아닌 호출자 스레드에서 호출됩니다.
+        (Streamlit 요소는 스크립트를 실행하는 스레드에서만 갱신할 수 있음)
+        """
+        calls = queue.Queue()
+        
+        def relay(callback):
+            return None if callback is None else (lambda *args: calls.put((callback, args)))
+        
+        future = asyncio.run_coroutine_threadsafe(
+            self.analyze_document_async(
+                content, on_step=relay(on_step), input_sections=input_sections,
+                report_callback=relay(report_callback), thread_id=thread_id,
+                regenerate_report=regenerate_report
+            ),
+            self._loop
+        )
+        while not (future.done() and calls.empty()):
+            try:
+                callback, args = calls.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            callback(*args)
+        return future.result()
+    
+    async def analyze_document_async(self, content: str, on_step=None,
+                                     input_sections: Dict[str, str] = None,
+                                     report_callback=None, thread_id: str = None,
+                                     regenerate_report: bool = False) -> AnalysisState:
+        """문서 분석 실행 (비동기, 병렬 노드를 이벤트 루프에서 동시에 진행)
+        
+        on_step(name, idx, total)은 에이전트가 끝날 때마다 호출됩니다.
+        input_sections는 select_input_sections로 고른 에이전트별 문서 조각입니다.
+        report_callback(text)은 최종 보고서가 스트리밍되는 동안 조각마다 호출됩니다.
+        thread_id(문서 내용 해시 등)를 주면 단계별 결과를 CHECKPOINT_PATH에 저장하고,
+        같은 thread_id로 다시 실행할 때 이미 끝난 에이전트는 건너뜁니다.
+        오류 없이 완료된 분석은 저장된 결과를 그대로 돌려주고, regenerate_report=True이거나
+        보고서 생성만 실패했으면 앞 단계 결과로 보고서만 다시 생성합니다.
+        웹 검색·점수 계산이 실패했던 분석은 그 단계부터 다시 실행합니다.
+        """
+        config = {
+            "max_concurrency": MAX_AGENT_CONCURRENCY,
+            "configurable": {"report_callback": report_callback}
+        }
+        if thread_id is None:
+            return await self._run_workflow(
+                self.workflow, self._initial_state(content, input_sections), config, on_step
+            )
         
-        result = self.workflow.invoke(initial_state)
+        config["configurable"]["thread_id"] = thread_id
+        async with AsyncSqliteSaver.from_conn_string(CHECKPOINT_PATH) as checkpointer:
+            workflow = self.workflow.builder.compile(checkpointer=checkpointer)
+            snapshot = await workflow.aget_state(config)
+            saved = snapshot.values
+            if snapshot.next:
+                # 중단된 실행은 마지막으로 끝난 에이전트 다음부터 이어서 진행
+                inputs = None
+            elif saved and saved["primary_analysis"] and saved["risk_assessment"]:
+                errors = saved["error_message"].split("\n") if saved["error_message"] else []
+                if not errors and not regenerate_report:
+                    # 오류 없이 끝난 문서는 저장된 결과를 그대로 사용
+                    return saved
+                if all(e.startswith(_REPORT_ERROR_PREFIX) for e in errors):
+                    # 보고서만 실패했거나 다시 요청하면 앞 단계 결과로 보고서만 다시 생성
+                    resume_after = "compliance_scorer"
+                else:
+                    # 웹 검색·점수 계산이 실패했으면 분류·1차 분석 직후부터 다시 실행
+                    # (위험도 평가는 입력이 같아 캐시된 응답을 쓰므로 LLM을 다시 호출하지 않음)
+                    resume_after = "document_analyzer"
+                await workflow.aupdate_state(
+                    config,
+                    {
+                        "error_message": _ReplaceErrors(""),
+                        "analyzed_at": datetime.now().strftime("%Y-%m-%d %H:%M")
+                    },
+                    as_node=resume_after
+                )
+                inputs = None
+            else:
+                # 처음 분석하거나 LLM 분석 단계가 실패했으면 저장된 결과를 지우고 처음부터 진행
+                await checkpointer.adelete_thread(thread_id)
+                inputs = self._initial_state(content, input_sections)
+            return await self._run_workflow(workflow, inputs, config, on_step)
+    
+    async def _run_workflow(self, workflow, inputs, config, on_step=None) -> AnalysisState:
+        """워크플로우 실행 (on_step이 있으면 에이전트가 끝날 때마다 진행 상황 전달)
+        
+        inputs가 None이면 체크포인트에 저장된 상태에서 이어서 실행합니다.
+        """
+        if on_step is None:
+            return await workflow.ainvoke(inputs, config=config)
+        
+        total = len(workflow.builder.nodes)
+        result, done = inputs, 0
+        async for mode, chunk in workflow.astream(inputs, config=config,
+                                                  stream_mode=["updates", "values"]):
+            if mode == "values":
+                result = chunk
+                continue
+            for node, update in chunk.items():
+                on_step((update or {}).get("current_step") or node, done, total)
+                done += 1
         return result
     
+    async def analyze_documents(self, contents: List[str]) -> List[AnalysisState]:
+        """여러 문서를 동시에 분석 (문서 분류·1차 분석은 한 번의 abatch 호출로 묶어 처리)
+        
+        동기 코드에서는 run_async(self.analyze_documents(...))로 상시 이벤트 루프에서 실행합니다.
+        """
+        states = [self._initial_state(content) for content in contents]
+        
+        responses = await self.llm_analyze.abatch(
+            [self._analyze_messages(self._agent_input(state, "document_analyzer")) for state in states],
+            config={"max_concurrency": BATCH_MAX_CONCURRENCY},
+            return_exceptions=True
+        )
+        for state, response in zip(states, responses):
+            # 일괄 분석에 실패한 문서는 워크플로우의 분류·1차 분석 노드가 다시 시도
+            if not isinstance(response, Exception):
+                state.update(self._analysis_update(response))
+        
+        semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+        
+        async def run(state):
+            async with semaphore:
+                return await self.workflow.ainvoke(state, config={"max_concurrency": MAX_AGENT_CONCURRENCY})
+        
+        return await asyncio.gather(*(run(state) for state in states))
+    
     def create_score_chart(self, compliance_scores: Dict[str, Any]) -> go.Figure:
         """준수 점수 차트 생성 (개선된 디자인)"""
         categories = []
         scores = []
-        colors = []
         hover_texts = []
         
         for category, data in compliance_scores.items():
@@ -661,19 +1117,10 @@ class MultiAgentAnalysisSystem:
                 categories.append(category)
                 score = data["점수"]
                 scores.append(score)
-                grade = data.get("등급", "")
-                
-                # 점수에 따른 색상 설정 (그라데이션)
-                if score >= 90:
-                    colors.append("rgba(22, 163, 74, 0.8)")  # 녹색
-                elif score >= 80:
-                    colors.append("rgba(59, 130, 246, 0.8)")  # 파란색
-                elif score >= 70:
-                    colors.append("rgba(245, 158, 11, 0.8)")  # 주황색
-                else:
-                    colors.append("rgba(220, 38, 38, 0.8)")  # 빨간색
-                
-                hover_texts.append(f"{category}<br>점수: {score}점<br>등급: {grade}")
+                hover_texts.append(f"{category}<br>점수: {score}점<br>등급: {data.get('등급', '')}")
+        
+        # 점수에 따른 색상을 한 번에 선택
+        colors = _BAR_COLORS[np.searchsorted(_BAR_COLOR_THRESHOLDS, scores, side="right")].tolist()
         
         # 막대 차트 생성
         fig = go.Figure(data=[
@@ -716,26 +1163,30 @@ class MultiAgentAnalysisSystem:
                 x=0.5,
                 font=dict(size=18, color="#1e40af")
             ),
+            # 기본 템플릿과 격자선을 빼서 Figure JSON과 렌더링 비용을 줄임
+            template="none",
             xaxis=dict(
                 title=dict(text="<b>평가 항목</b>", font=dict(size=14, color="#374151")),
                 tickfont=dict(size=12, color="#374151"),
-                gridcolor='rgba(59, 130, 246, 0.1)',
-                showgrid=False
+                showgrid=False,
+                zeroline=False
             ),
             yaxis=dict(
                 title=dict(text="<b>준수 점수</b>", font=dict(size=14, color="#374151")),
                 tickfont=dict(size=12, color="#374151"),
                 range=[0, 100],
-                gridcolor='rgba(59, 130, 246, 0.1)',
-                showgrid=True,
-                gridwidth=1
+                showgrid=False,
+                zeroline=False
             ),
             plot_bgcolor='rgba(0,0,0,0)',
             paper_bgcolor='rgba(0,0,0,0)',
             font=dict(family="Arial, sans-serif"),
             showlegend=False,
-            height=400,
-            margin=dict(l=60, r=40, t=80, b=60)
+            width=CHART_WIDTH,
+            height=CHART_HEIGHT,
+            autosize=False,
+            uirevision="fixed",
+            margin=dict(l=50, r=20, t=50, b=50)
         )
         
         return fig
@@ -772,7 +1223,9 @@ class MultiAgentAnalysisSystem:
         ))
         
         fig.update_layout(
+            template="none",
             polar=dict(
+                bgcolor="rgba(0,0,0,0)",
                 radialaxis=dict(
                     visible=True,
                     range=[0, 100],
@@ -790,20 +1243,19 @@ class MultiAgentAnalysisSystem:
                 font=dict(size=16, color="#1e40af")
             ),
             showlegend=False,
-            height=400,
+            width=CHART_WIDTH,
+            height=CHART_HEIGHT,
+            autosize=False,
+            uirevision="fixed",
+            margin=dict(l=40, r=40, t=50, b=30),
             font=dict(family="Arial, sans-serif")
         )
         
         return fig
 
 
-def create_intelligent_router(openai_api_key: str):
-    """지능형 라우팅 시스템 - 고도화된 AI 분류 엔진"""
-    llm = ChatOpenAI(openai_api_key=openai_api_key, model_name="gpt-4o", temperature=0)
-    
-    def route_question(question: str) -> str:
-        """질문을 적절한 기능으로 라우팅 - 문맥 이해 기반 정밀 분류"""
-        prompt = ChatPromptTemplate.from_template("""
+# 라우터 프롬프트·정규식·조회표는 질문마다 다시 만들지 않도록 모듈 로드 시 한 번만 생성
+_ROUTER_PROMPT = ChatPromptTemplate.from_template("""
         당신은 금융 규제 전문가로서 사용자의 질문 의도를 정확히 파악하여 최적의 서비스로 연결하는 전문 라우터입니다.
         다음 질문을 다각도로 분석하여 가장 적합한 기능으로 정밀 분류해주세요.
         
@@ -864,33 +1316,43 @@ def create_intelligent_router(openai_api_key: str):
         
         반드시 "분석 과정" 후에 최종 번호만 반환하세요 (1, 2, 3 중 하나):
         """)
-        
+# 응답 끝의 최종 분류 번호
+_ROUTE_RE = re.compile(r'\b[123]\b')
+_ROUTE_MAP = {
+    "1": "qa_chatbot",
+    "2": "document_analysis",
+    "3": "multi_agent"
+}
+# LLM 응답에서 번호를 찾지 못했을 때 쓰는 키워드 폴백
+_MULTI_AGENT_KEYWORDS = ('종합', '전문', '위험도', '보안', '컴플라이언스', '평가', '검토', '체크', '점수')
+_DOCUMENT_KEYWORDS = ('분석', '요약', '리뷰', '확인', '내용')
+
+
+def create_intelligent_router(openai_api_key: str):
+    """지능형 라우팅 시스템 - 고도화된 AI 분류 엔진"""
+    llm = ChatOpenAI(openai_api_key=openai_api_key, model_name="gpt-4o", temperature=0)
+    
+    def route_question(question: str) -> str:
+        """질문을 적절한 기능으로 라우팅 - 문맥 이해 기반 정밀 분류"""
         try:
-            response = llm.invoke(prompt.format_messages(question=question))
+            response = llm.invoke(_ROUTER_PROMPT.format_messages(question=question))
             response_text = response.content.strip()
             
             # 응답에서 최종 번호 추출 (마지막 숫자 찾기)
-            import re
-            numbers = re.findall(r'\b[123]\b', response_text)
+            numbers = _ROUTE_RE.findall(response_text)
             if numbers:
                 classification = numbers[-1]  # 마지막 숫자 사용
             else:
                 # 기본 키워드 기반 폴백 분류
                 question_lower = question.lower()
-                if any(word in question_lower for word in ['종합', '전문', '위험도', '보안', '컴플라이언스', '평가', '검토', '체크', '점수']):
+                if any(word in question_lower for word in _MULTI_AGENT_KEYWORDS):
                     classification = "3"
-                elif any(word in question_lower for word in ['분석', '요약', '리뷰', '확인', '내용']):
+                elif any(word in question_lower for word in _DOCUMENT_KEYWORDS):
                     classification = "2"
                 else:
                     classification = "1"
             
-            route_map = {
-                "1": "qa_chatbot",
-                "2": "document_analysis", 
-                "3": "multi_agent"
-            }
-            
-            return route_map.get(classification, "qa_chatbot")
+            return _ROUTE_MAP.get(classification, "qa_chatbot")
         except Exception as e:
             # 오류 발생 시 기본값 반환
             return "qa_chatbot"